@@ -0,0 +1,178 @@
+"""Stand-in for dcc32/dcc64/msbuild that prints realistic compiler output.
+
+Invoked through the wrappers written by ``make_toolchain`` as::
+
+    fake_compiler.py dcc32|dcc64|msbuild <compiler arguments>
+
+Output size, message rates and speed are set through environment variables:
+
+    FAKE_UNITS          units "compiled" per run (default 50)
+    FAKE_LINES_PER_UNIT progress lines per unit (default 10)
+    FAKE_WARNING_RATE   probability of a warning per unit (default 0.2)
+    FAKE_HINT_RATE      probability of a hint per unit (default 0.1)
+    FAKE_ERROR_RATE     probability of an error per unit (default 0)
+    FAKE_DELAY          total run time in seconds, spread over the units (default 0)
+    FAKE_SEED           random seed (default: derived from the project path)
+
+Like the real tools, the run fails (exit code 1) if any error was printed,
+and on success an empty binary is written where the server expects it:
+next to the .dpr for dcc, in ``<project dir>/<Platform>/<Config>`` for
+msbuild (the layout used by ``synthetic.py``).
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import stat
+import sys
+import time
+import zlib
+from pathlib import Path
+
+WARNINGS = (
+    ("W1000", "Symbol 'FormatDateTime' is deprecated"),
+    ("W1057", "Implicit string cast from 'AnsiString' to 'string'"),
+    ("W1036", "Variable 'I' might not have been initialized"),
+)
+HINTS = (
+    ("H2164", "Variable 'Tmp' is declared but never used in 'TForm1.Button1Click'"),
+    ("H2077", "Value assigned to 'Result' never used"),
+)
+ERRORS = (
+    ("E2003", "Undeclared identifier: 'Foo'"),
+    ("E2010", "Incompatible types: 'Integer' and 'string'"),
+    ("E2029", "';' expected but identifier 'end' found"),
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _project_arg(args: list[str]) -> Path:
+    for arg in args:
+        if Path(arg).suffix.lower() in (".dpr", ".dproj", ".dpk"):
+            return Path(arg)
+    return Path("Project1.dpr")
+
+
+def _msbuild_props(args: list[str]) -> dict[str, str]:
+    props = {}
+    for arg in args:
+        if arg.lower().startswith("/p:") and "=" in arg:
+            name, _, value = arg[3:].partition("=")
+            props[name.lower()] = value
+    return props
+
+
+def run(tool: str, args: list[str]) -> int:
+    project = _project_arg(args)
+    units = int(_env_float("FAKE_UNITS", 50))
+    per_unit = int(_env_float("FAKE_LINES_PER_UNIT", 10))
+    warning_rate = _env_float("FAKE_WARNING_RATE", 0.2)
+    hint_rate = _env_float("FAKE_HINT_RATE", 0.1)
+    error_rate = _env_float("FAKE_ERROR_RATE", 0.0)
+    delay = _env_float("FAKE_DELAY", 0.0)
+    seed = os.environ.get("FAKE_SEED")
+    rng = random.Random(int(seed) if seed else zlib.crc32(str(project).encode()))
+
+    msbuild = tool == "msbuild"
+    props = _msbuild_props(args) if msbuild else {}
+    platform = props.get("platform", "Win64" if tool == "dcc64" else "Win32")
+    config = props.get("config", "Debug")
+    proj_dir = project.resolve().parent
+    out = sys.stdout
+    indent = "  " if msbuild else ""
+    diagnostics: list[str] = []
+
+    if msbuild:
+        out.write("Microsoft (R) Build Engine version 4.8.9037.0\n")
+        out.write(f"Build started {time.strftime('%d.%m.%Y %H:%M:%S')}.\n")
+        out.write(f'Project "{project}" on node 1 (Build target(s)).\n_PasCoreCompile:\n')
+    out.write(f"{indent}Embarcadero Delphi for {platform} compiler version 36.0\n")
+    out.write(f"{indent}Copyright (c) 1983,2024 Embarcadero Technologies, Inc.\n")
+
+    errors = warnings = 0
+    total_lines = 0
+    for n in range(1, units + 1):
+        unit = f"Unit{n}.pas"
+        for i in range(1, per_unit + 1):
+            out.write(f"{indent}{unit}({i * 37})\n")
+        total_lines += per_unit * 37
+        for rate, pool, severity in (
+            (warning_rate, WARNINGS, "Warning"),
+            (hint_rate, HINTS, "Hint"),
+            (error_rate, ERRORS, "Error"),
+        ):
+            if rng.random() >= rate:
+                continue
+            code, message = rng.choice(pool)
+            line = rng.randint(1, per_unit * 37)
+            if msbuild:
+                text = (
+                    f"{proj_dir / unit}({line},{rng.randint(1, 40)}): {severity.lower()} "
+                    f"{code}: {message} [{project}]"
+                )
+            else:
+                text = f"{unit}({line}) {severity}: {code} {message}"
+            out.write(text + "\n")
+            diagnostics.append(text)
+            if severity == "Error":
+                errors += 1
+            elif severity == "Warning":
+                warnings += 1
+        if delay:
+            out.flush()
+            time.sleep(delay / units)
+
+    ok = errors == 0
+    if ok:
+        out.write(f"{indent}{total_lines} lines, 0.42 seconds, 1234567 bytes code, 123456 bytes data.\n")
+    elif not msbuild:
+        out.write(f"{project.stem}.dpr(5) Fatal: F2063 Could not compile used unit 'Unit1.pas'\n")
+    if msbuild:
+        # msbuild repeats every warning and error in its summary
+        out.write(f'Done Building Project "{project}" (Build target(s)).\n\n')
+        out.write("Build succeeded.\n" if ok else "Build FAILED.\n\n")
+        for text in diagnostics:
+            if " hint " not in text:
+                out.write(text + "\n")
+        out.write(f"    {warnings} Warning(s)\n    {errors} Error(s)\n")
+    out.flush()
+
+    if ok:
+        if msbuild:
+            target = proj_dir / platform / config / f"{project.stem}.exe"
+        else:
+            target = project.with_suffix(".exe")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.touch()
+    return 0 if ok else 1
+
+
+def make_toolchain(root: Path) -> Path:
+    """Create a fake RAD Studio layout usable as DELPHI_PATH.
+
+    ``bin`` holds ``dcc32.exe``, ``dcc64.exe`` and ``msbuild.exe`` shell
+    wrappers that run this script with the current interpreter, and an empty
+    ``rsvars.bat``.
+    """
+    bin_dir = root / "bin"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = Path(__file__).resolve()
+    for tool in ("dcc32", "dcc64", "msbuild"):
+        wrapper = bin_dir / f"{tool}.exe"
+        wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" {tool} "$@"\n')
+        wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    (bin_dir / "rsvars.bat").write_text("")
+    return root
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("dcc32", "dcc64", "msbuild"):
+        sys.exit("usage: fake_compiler.py dcc32|dcc64|msbuild [args...]")
+    sys.exit(run(sys.argv[1], sys.argv[2:]))
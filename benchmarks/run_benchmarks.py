@@ -0,0 +1,436 @@
+"""Measure the overhead the server adds on top of the compiler.
+
+Runs on any machine with Python: the compiler is replaced by
+``fake_compiler.py`` and the projects by trees from ``synthetic.py``.
+
+Usage::
+
+    python benchmarks/run_benchmarks.py --sizes small,medium --output results.json
+    python benchmarks/run_benchmarks.py --only parse_output,run_subprocess
+
+Results are written as JSON: one record per benchmark and parameter set with
+timing statistics in seconds, so runs can be compared with any JSON tool.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.insert(0, str(REPO / "src"))
+sys.path.insert(0, str(HERE))
+
+import fake_compiler  # noqa: E402
+import synthetic  # noqa: E402
+
+BENCHMARKS = (
+    "discover_project",
+    "extract_output_dirs",
+    "parse_output",
+    "run_subprocess",
+    "tool_calls_stdio",
+    "tool_calls_http",
+)
+
+
+def _stats(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p50": ordered[(len(ordered) - 1) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+class Results:
+    """Collected benchmark records."""
+
+    def __init__(self) -> None:
+        self.records: list[dict[str, Any]] = []
+
+    def add(self, name: str, params: dict[str, Any], samples: list[float], **extra: Any) -> None:
+        record = {"name": name, "params": params, "seconds": _stats(samples), **extra}
+        self.records.append(record)
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        s = record["seconds"]
+        print(f"{name:22} {label:40} p50 {s['p50'] * 1000:9.3f} ms  p95 {s['p95'] * 1000:9.3f} ms")
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _server_env(toolchain: Path, cache_dir: Path, **fake: Any) -> dict[str, str]:
+    env = dict(os.environ)
+    env["DELPHI_PATH"] = str(toolchain)
+    # Keep the unit graph store out of the user's cache folder
+    env["XDG_CACHE_HOME"] = str(cache_dir)
+    env.pop("LOCALAPPDATA", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO / "src"), env.get("PYTHONPATH")]))
+    env.update({f"FAKE_{k.upper()}": str(v) for k, v in fake.items()})
+    return env
+
+
+def _new_server(work: Path):
+    from delphi_mcp_server.server import DelphiMCPServer
+
+    return DelphiMCPServer(log_file=work / "server.log")
+
+
+def bench_discover_project(results: Results, trees: dict[str, synthetic.SyntheticTree], work: Path, repeat: int) -> None:
+    server = _new_server(work)
+    cwd = Path.cwd()
+    try:
+        for size, tree in trees.items():
+            # Discovery looks at the current directory
+            os.chdir(tree.root)
+
+            def cold() -> None:
+                server._project_indexes.clear()
+                server.discover_project()
+
+            results.add("discover_project", {"size": size, "cache": "cold"}, _timed(cold, repeat))
+            results.add(
+                "discover_project", {"size": size, "cache": "warm"}, _timed(server.discover_project, repeat)
+            )
+    finally:
+        os.chdir(cwd)
+
+
+def bench_extract_output_dirs(results: Results, trees: dict[str, synthetic.SyntheticTree], work: Path, repeat: int) -> None:
+    from delphi_mcp_server.dproj import ProjectModelCache
+
+    server = _new_server(work)
+    for size, tree in trees.items():
+        def run_all() -> None:
+            for proj in tree.projects:
+                server.extract_output_dirs(proj, "Win32", "Debug")
+
+        def cold() -> None:
+            server.projects = ProjectModelCache()
+            run_all()
+
+        params = {"size": size, "projects": len(tree.projects)}
+        results.add("extract_output_dirs", {**params, "cache": "cold"}, _timed(cold, repeat))
+        results.add("extract_output_dirs", {**params, "cache": "warm"}, _timed(run_all, repeat))
+
+
+def _fake_output(tool: str, units: int, error_rate: float) -> list[str]:
+    env = {"FAKE_UNITS": str(units), "FAKE_ERROR_RATE": str(error_rate), "FAKE_SEED": "1"}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    buffer = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(buffer):
+            fake_compiler.run(tool, [str(Path(tmp) / "P.dproj")])
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return buffer.getvalue().splitlines()
+
+
+def bench_parse_output(results: Results, repeat: int) -> None:
+    from delphi_mcp_server.output import BuildOutput
+
+    for tool in ("dcc32", "msbuild"):
+        for units in (100, 1000, 10000):
+            lines = _fake_output(tool, units, 0.05)
+
+            def parse() -> None:
+                stats = BuildOutput()
+                for line in lines:
+                    stats.feed(line)
+
+            samples = _timed(parse, repeat)
+            results.add(
+                "parse_output",
+                {"format": tool, "lines": len(lines)},
+                samples,
+                lines_per_second=len(lines) / statistics.median(samples),
+            )
+
+
+def bench_run_subprocess(results: Results, toolchain: Path, work: Path, repeat: int) -> None:
+    server = _new_server(work)
+    project = work / "subprocess" / "P.dpr"
+    project.parent.mkdir(parents=True, exist_ok=True)
+    project.write_text("program P;\nbegin\nend.\n")
+    dcc = str(toolchain / "bin" / "dcc32.exe")
+
+    async def baseline(cmd: list[str]) -> None:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        assert proc.stdout is not None
+        while await proc.stdout.readline():
+            pass
+        await proc.wait()
+
+    async def measure(make: Callable[[], Awaitable[Any]]) -> list[float]:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await make()
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    async def main() -> None:
+        for units in (10, 200, 2000):
+            os.environ["FAKE_UNITS"] = str(units)
+            os.environ["FAKE_ERROR_RATE"] = "0"
+            cmd = [dcc, str(project)]
+            base = await measure(lambda: baseline(cmd))
+            timed = await measure(lambda: server.run_subprocess(cmd))
+            # About 10 progress lines per unit plus its warnings and hints
+            results.add("run_subprocess", {"units": units, "mode": "raw_read"}, base)
+            results.add(
+                "run_subprocess",
+                {"units": units, "mode": "server"},
+                timed,
+                overhead_p50=statistics.median(timed) - statistics.median(base),
+            )
+        os.environ.pop("FAKE_UNITS", None)
+        os.environ.pop("FAKE_ERROR_RATE", None)
+
+    saved = os.environ.get("DELPHI_PATH")
+    os.environ["DELPHI_PATH"] = str(toolchain)
+    try:
+        asyncio.run(main())
+    finally:
+        if saved is None:
+            os.environ.pop("DELPHI_PATH", None)
+        else:
+            os.environ["DELPHI_PATH"] = saved
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _call_concurrently(session: Any, calls: list[tuple[str, dict[str, Any]]]) -> tuple[list[float], float, int]:
+    async def one(name: str, args: dict[str, Any]) -> tuple[float, bool]:
+        start = time.perf_counter()
+        result = await session.call_tool(name, args)
+        elapsed = time.perf_counter() - start
+        # Tools report failures as "ERROR: ..." text rather than protocol errors
+        text = result.content[0].text if result.content else ""
+        return elapsed, not result.isError and not text.startswith("ERROR")
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(n, a) for n, a in calls))
+    wall = time.perf_counter() - start
+    return [t for t, _ in outcomes], wall, sum(1 for _, ok in outcomes if not ok)
+
+
+async def _tool_call_suite(
+    results: Results, transport: str, session: Any, tree: synthetic.SyntheticTree, size: str, repeat: int
+) -> None:
+    projects = [str(p) for p in tree.projects]
+    for concurrency in (1, 4, 16):
+        latencies: list[float] = []
+        walls: list[float] = []
+        failed = 0
+        for _ in range(repeat):
+            calls = [
+                ("compile", {"project": projects[i % len(projects)], "force": True})
+                for i in range(concurrency)
+            ]
+            lat, wall, errs = await _call_concurrently(session, calls)
+            latencies += lat
+            walls.append(wall)
+            failed += errs
+        results.add(
+            f"tool_calls_{transport}",
+            {"tool": "compile", "size": size, "concurrency": concurrency},
+            latencies,
+            wall_seconds=_stats(walls),
+            calls_per_second=concurrency / statistics.median(walls),
+            failed_calls=failed,
+        )
+        # Same calls again without force: answered from the build cache
+        lat, wall, errs = await _call_concurrently(
+            session,
+            [("compile", {"project": projects[i % len(projects)]}) for i in range(concurrency)],
+        )
+        results.add(
+            f"tool_calls_{transport}",
+            {"tool": "compile_cached", "size": size, "concurrency": concurrency},
+            lat,
+            failed_calls=errs,
+        )
+    lat, _, errs = await _call_concurrently(
+        session, [("list_projects", {"root": str(tree.root)})] * repeat
+    )
+    results.add(f"tool_calls_{transport}", {"tool": "list_projects", "size": size}, lat, failed_calls=errs)
+
+
+def _server_args(work: Path, max_workers: int) -> list[str]:
+    return [
+        "-m", "delphi_mcp_server.main",
+        "--log-file", str(work / "server.log"),
+        "--max-workers", str(max_workers),
+    ]
+
+
+def bench_tool_calls_stdio(results: Results, trees: dict[str, synthetic.SyntheticTree], toolchain: Path, work: Path, repeat: int, max_workers: int) -> None:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=_server_args(work, max_workers),
+        env=_server_env(toolchain, work / "cache", units=20),
+        cwd=str(work),
+    )
+
+    async def main() -> None:
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for size, tree in trees.items():
+                    await _tool_call_suite(results, "stdio", session, tree, size, repeat)
+
+    asyncio.run(main())
+
+
+def bench_tool_calls_http(results: Results, trees: dict[str, synthetic.SyntheticTree], toolchain: Path, work: Path, repeat: int, max_workers: int) -> None:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, *_server_args(work, max_workers), "--transport", "http",
+         "--host", "127.0.0.1", "--port", str(port)],
+        env=_server_env(toolchain, work / "cache", units=20),
+        cwd=work,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("HTTP server did not start")
+                time.sleep(0.2)
+
+        async def main() -> None:
+            async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    for size, tree in trees.items():
+                        await _tool_call_suite(results, "http", session, tree, size, repeat)
+
+        asyncio.run(main())
+        metrics = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+        results.records[-1]["server_metrics"] = metrics
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True, text=True, timeout=10
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="small,medium", help="Tree sizes: " + ", ".join(synthetic.SIZES))
+    parser.add_argument("--only", help="Comma-separated benchmarks: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per measurement (default: 5)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Server worker pool size (default: 4)")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="JSON result file")
+    parser.add_argument("--work-dir", type=Path, help="Keep generated trees here instead of a temp dir")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in synthetic.SIZES]
+    if unknown:
+        parser.error(f"unknown size: {', '.join(unknown)}")
+    selected = [b.strip() for b in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [b for b in selected if b not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="delphi-mcp-bench-") as tmp:
+        work = (args.work_dir or Path(tmp)).resolve()
+        work.mkdir(parents=True, exist_ok=True)
+        os.environ["XDG_CACHE_HOME"] = str(work / "cache")
+        os.environ.pop("LOCALAPPDATA", None)
+        toolchain = fake_compiler.make_toolchain(work / "toolchain")
+        trees = {size: synthetic.make_tree(work / "trees" / size, size) for size in sizes}
+
+        results = Results()
+        started = time.perf_counter()
+        if "discover_project" in selected:
+            bench_discover_project(results, trees, work, args.repeat)
+        if "extract_output_dirs" in selected:
+            bench_extract_output_dirs(results, trees, work, args.repeat)
+        if "parse_output" in selected:
+            bench_parse_output(results, args.repeat)
+        if "run_subprocess" in selected:
+            bench_run_subprocess(results, toolchain, work, args.repeat)
+        if "tool_calls_stdio" in selected:
+            bench_tool_calls_stdio(results, trees, toolchain, work, args.repeat, args.max_workers)
+        if "tool_calls_http" in selected:
+            bench_tool_calls_http(results, trees, toolchain, work, args.repeat, args.max_workers)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": {s: dict(zip(("projects", "units", "shared", "noise"), synthetic.SIZES[s])) for s in sizes},
+            "repeat": args.repeat,
+            "max_workers": args.max_workers,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+        },
+        "results": results.records,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Synthetic Delphi source trees for benchmarks."""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+# name -> (projects, units per project, shared units, noise files per project)
+SIZES = {
+    "small": (3, 10, 5, 5),
+    "medium": (20, 40, 30, 30),
+    "large": (100, 80, 200, 100),
+}
+
+DPROJ_TEMPLATE = """<Project xmlns="http://schemas.microsoft.com/developer/msbuild/2003">
+    <PropertyGroup>
+        <ProjectGuid>{{00000000-0000-0000-0000-{index:012d}}}</ProjectGuid>
+        <MainSource>{name}.dpr</MainSource>
+        <Config Condition="'$(Config)'==''">Debug</Config>
+        <Platform Condition="'$(Platform)'==''">Win32</Platform>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Config)'=='Base' or '$(Base)'!=''">
+        <Base>true</Base>
+    </PropertyGroup>
+    <PropertyGroup Condition="('$(Platform)'=='Win32' and '$(Base)'=='true') or '$(Base_Win32)'!=''">
+        <Base_Win32>true</Base_Win32>
+        <CfgParent>Base</CfgParent>
+        <Base>true</Base>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Config)'=='Debug' or '$(Cfg_1)'!=''">
+        <Cfg_1>true</Cfg_1>
+        <CfgParent>Base</CfgParent>
+        <Base>true</Base>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Config)'=='Release' or '$(Cfg_2)'!=''">
+        <Cfg_2>true</Cfg_2>
+        <CfgParent>Base</CfgParent>
+        <Base>true</Base>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Base)'!=''">
+        <DCC_ExeOutput>.\\$(Platform)\\$(Config)</DCC_ExeOutput>
+        <DCC_DcuOutput>.\\$(Platform)\\$(Config)\\dcu</DCC_DcuOutput>
+        <DCC_UnitSearchPath>..\\..\\shared;$(DCC_UnitSearchPath)</DCC_UnitSearchPath>
+        <DCC_Namespace>System;Xml;Data;Datasnap;Web;Soap;$(DCC_Namespace)</DCC_Namespace>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Base_Win32)'!=''">
+        <DCC_Namespace>Winapi;System.Win;Data.Win;$(DCC_Namespace)</DCC_Namespace>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Cfg_1)'!=''">
+        <DCC_Define>DEBUG;$(DCC_Define)</DCC_Define>
+        <DCC_Optimize>false</DCC_Optimize>
+    </PropertyGroup>
+    <PropertyGroup Condition="'$(Cfg_2)'!=''">
+        <DCC_Define>RELEASE;$(DCC_Define)</DCC_Define>
+    </PropertyGroup>
+    <ItemGroup>
+        <DelphiCompile Include="$(MainSource)">
+            <MainSource>MainSource</MainSource>
+        </DelphiCompile>
+{references}
+        <BuildConfiguration Include="Base">
+            <Key>Base</Key>
+        </BuildConfiguration>
+        <BuildConfiguration Include="Debug">
+            <Key>Cfg_1</Key>
+            <CfgParent>Base</CfgParent>
+        </BuildConfiguration>
+        <BuildConfiguration Include="Release">
+            <Key>Cfg_2</Key>
+            <CfgParent>Base</CfgParent>
+        </BuildConfiguration>
+    </ItemGroup>
+</Project>
+"""
+
+
+@dataclass
+class SyntheticTree:
+    """Paths of a generated tree."""
+
+    root: Path
+    projects: list[Path]
+    units: int
+
+
+def _unit_source(name: str, uses: list[str], lines: int) -> str:
+    body = "\n".join(f"  // line {i}" for i in range(lines))
+    uses_clause = f"uses\n  {', '.join(uses)};\n" if uses else ""
+    return (
+        f"unit {name};\n\ninterface\n\nuses\n  System.SysUtils, System.Classes;\n\n"
+        f"type\n  T{name} = class\n  end;\n\nimplementation\n\n"
+        f"{{$IFDEF MSWINDOWS}}\n{uses_clause}{{$ENDIF}}\n\n{body}\n\nend.\n"
+    )
+
+
+def make_tree(root: Path, size: str = "small", seed: int = 1) -> SyntheticTree:
+    """Write a tree of projects sharing a common unit folder.
+
+    Layout::
+
+        root/shared/SharedN.pas
+        root/apps/AppN/AppN.dproj, AppN.dpr, AppN.res, UnitsN_M.pas, ...
+        root/apps/AppN/__history, Win32/Debug  (noise that discovery must skip)
+    """
+    n_projects, n_units, n_shared, n_noise = SIZES[size]
+    rng = random.Random(seed)
+    shared_dir = root / "shared"
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    shared = [f"Shared{i}" for i in range(n_shared)]
+    for i, name in enumerate(shared):
+        deps = shared[max(0, i - 2):i]
+        (shared_dir / f"{name}.pas").write_text(_unit_source(name, deps, 50))
+
+    projects = []
+    for p in range(n_projects):
+        name = f"App{p}"
+        proj_dir = root / "apps" / name
+        proj_dir.mkdir(parents=True, exist_ok=True)
+        units = [f"{name}U{u}" for u in range(n_units)]
+        for u, unit in enumerate(units):
+            deps = units[max(0, u - 3):u] + rng.sample(shared, min(2, len(shared)))
+            (proj_dir / f"{unit}.pas").write_text(_unit_source(unit, deps, 100))
+            (proj_dir / f"{unit}.dfm").write_text(f"object {unit}: T{unit}\nend\n")
+        uses = ",\n  ".join(f"{u} in '{u}.pas'" for u in units)
+        (proj_dir / f"{name}.dpr").write_text(
+            f"program {name};\n\nuses\n  System.SysUtils,\n  {uses};\n\n{{$R *.res}}\n\nbegin\nend.\n"
+        )
+        (proj_dir / f"{name}.res").write_bytes(b"\0" * 1024)
+        references = "\n".join(
+            f'        <DCCReference Include="{u}.pas"/>' for u in units
+        )
+        dproj = proj_dir / f"{name}.dproj"
+        dproj.write_text(DPROJ_TEMPLATE.format(index=p, name=name, references=references))
+        projects.append(dproj)
+        for noise_dir in ("__history", "Win32/Debug/dcu"):
+            d = proj_dir / noise_dir
+            d.mkdir(parents=True, exist_ok=True)
+            for i in range(n_noise):
+                (d / f"noise{i}.pas.~{i}~").write_text("")
+    return SyntheticTree(root, projects, n_projects * n_units + n_shared)
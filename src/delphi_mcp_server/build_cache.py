@@ -0,0 +1,188 @@
+"""Content-addressed cache of build results."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from .discovery import DEFAULT_IGNORES
+
+# Files that take part in a compile: sources, includes, forms, resources and
+# project/package files.
+SOURCE_EXTENSIONS = (
+    ".pas", ".inc", ".dpr", ".dpk", ".dproj", ".dfm", ".fmx", ".res", ".rc",
+    ".optset",
+)
+
+_CHUNK = 1024 * 1024
+
+
+@dataclass
+class _FileStamp:
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class FileHasher:
+    """Content hashes of files, recomputed only when mtime or size change."""
+
+    def __init__(self, max_files: int = 200_000):
+        self.max_files = max_files
+        self._stamps: dict[str, _FileStamp] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path: str) -> str | None:
+        """Return the SHA-256 of a file, or None if it cannot be read."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            stamp = self._stamps.get(path)
+        if stamp and stamp.mtime_ns == st.st_mtime_ns and stamp.size == st.st_size:
+            return stamp.digest
+        h = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK), b""):
+                    h.update(chunk)
+        except OSError:
+            return None
+        digest = h.hexdigest()
+        with self._lock:
+            if len(self._stamps) >= self.max_files and path not in self._stamps:
+                self._stamps.clear()
+            self._stamps[path] = _FileStamp(st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+
+def collect_sources(project_dir: Path) -> list[str]:
+    """Return source files below a project directory, skipping output folders."""
+    found: list[str] = []
+    stack = [str(project_dir)]
+    while stack:
+        path = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for de in it:
+                try:
+                    if de.is_dir(follow_symlinks=False):
+                        if de.name not in DEFAULT_IGNORES:
+                            stack.append(de.path)
+                    elif os.path.splitext(de.name)[1].lower() in SOURCE_EXTENSIONS:
+                        found.append(de.path)
+                except OSError:
+                    continue
+    found.sort()
+    return found
+
+
+@dataclass
+class CachedBuild:
+    """Recorded result of a build."""
+
+    summary: str
+    exit_code: int
+    # Output binary -> (mtime_ns, size) when the build finished
+    outputs: dict[str, tuple[int, int]]
+    created: float
+
+    def outputs_unchanged(self) -> bool:
+        """True while every output still is the file this build wrote.
+
+        Configs and platforms may write the same binary (dcc puts ``P.exe``
+        next to the .dpr for all of them), so existence alone is not enough.
+        """
+        return all(_stamp(p) == stamp for p, stamp in self.outputs.items())
+
+
+def _stamp(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class BuildCache:
+    """LRU cache of build results keyed by a hash of all build inputs.
+
+    Entries are evicted when more than ``max_entries`` are stored or when they
+    are older than ``max_age`` seconds.
+    """
+
+    def __init__(self, max_entries: int = 256, max_age: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hasher = FileHasher()
+        self._entries: OrderedDict[str, CachedBuild] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute_key(
+        self,
+        project: Path,
+        sources: list[str],
+        defines: list[str],
+        platform: str,
+        config: str,
+        compiler_identity: str,
+    ) -> str:
+        """Hash project file, sources, defines, platform/config and compiler."""
+        h = hashlib.sha256()
+        for part in (str(project.resolve()), platform, config, compiler_identity):
+            h.update(part.encode("utf-8", errors="surrogateescape"))
+            h.update(b"\0")
+        for define in sorted(defines):
+            h.update(define.encode("utf-8", errors="surrogateescape"))
+            h.update(b"\0")
+        for path in sorted(set(sources) | {str(project)}):
+            digest = self.hasher.digest(path)
+            h.update(path.encode("utf-8", errors="surrogateescape"))
+            h.update(b"\0")
+            h.update((digest or "missing").encode("ascii"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_entries or now - entry.created > self.max_age:
+                del self._entries[key]
+            else:
+                break
+
+    def get(self, key: str) -> CachedBuild | None:
+        """Return a cached build if it is fresh and its outputs are unchanged."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created > self.max_age or not entry.outputs_unchanged():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, summary: str, exit_code: int, outputs: list[str]) -> None:
+        """Record the result of a build together with the current state of its outputs."""
+        stamps = {p: _stamp(p) for p in outputs}
+        if None in stamps.values():
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = CachedBuild(summary, exit_code, stamps, now)
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,277 @@
+"""Per-build compiler logs with retention, compression and ranged reads."""
+
+from __future__ import annotations
+
+import bisect
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+_BUILD_ID_RE = re.compile(r"^[\w-]+$")
+_CHUNK = 64 * 1024
+# Uncompressed bytes per gzip member of a compressed log
+_MEMBER = 1024 * 1024
+
+
+class BuildLogWriter:
+    """Append-only log of one build; one line per compiler output line."""
+
+    def __init__(self, store: BuildLogStore, build_id: str, path: Path):
+        self.store = store
+        self.build_id = build_id
+        self.path = path
+        self._file = open(path, "wb")
+
+    def write(self, line: str) -> None:
+        self._file.write(line.encode("utf-8", errors="replace") + b"\n")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            self.store._closed(self.build_id)
+
+    def __enter__(self) -> BuildLogWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class BuildLogStore:
+    """Directory of build logs named after their (time-ordered) build ids.
+
+    The newest ``keep_plain`` logs stay uncompressed; older ones are gzipped
+    as a series of members of ``_MEMBER`` uncompressed bytes.  A
+    ``<build id>.log.idx`` file next to them holds the original size and the
+    (uncompressed, compressed) offset of every member, so a ranged read or a
+    tail decompresses only the members it needs.
+    The oldest logs are deleted once there are more than ``max_builds`` or
+    they take more than ``max_bytes`` on disk.  Reads never load a whole log:
+    byte ranges are served by seeking, ``tail`` reads backwards from the end
+    and ``grep`` streams the file.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_builds: int = 500,
+        max_bytes: int = 2 * 1024**3,
+        keep_plain: int = 10,
+    ):
+        self.root = root
+        self.max_builds = max_builds
+        self.max_bytes = max_bytes
+        self.keep_plain = keep_plain
+        self._open: set[str] = set()
+        self._lock = threading.Lock()
+
+    def open(self, build_id: str) -> BuildLogWriter:
+        """Create the log of a new build."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._open.add(build_id)
+        return BuildLogWriter(self, build_id, self.root / f"{build_id}.log")
+
+    def _closed(self, build_id: str) -> None:
+        with self._lock:
+            self._open.discard(build_id)
+
+    def path(self, build_id: str) -> Path | None:
+        """Return the log file of a build (plain or compressed), if it exists."""
+        if not _BUILD_ID_RE.match(build_id):
+            return None
+        for name in (f"{build_id}.log", f"{build_id}.log.gz"):
+            candidate = self.root / name
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def _logs(self) -> list[tuple[str, Path]]:
+        """Return (build id, path) of all logs, oldest first."""
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return []
+        logs = []
+        for de in entries:
+            for suffix in (".log.gz", ".log"):
+                if de.name.endswith(suffix) and de.is_file():
+                    logs.append((de.name[: -len(suffix)], Path(de.path)))
+                    break
+        logs.sort()
+        return logs
+
+    def latest(self) -> str | None:
+        logs = self._logs()
+        return logs[-1][0] if logs else None
+
+    def size(self, build_id: str) -> int | None:
+        """Return the uncompressed size of a log in bytes."""
+        path = self.path(build_id)
+        if path is None:
+            return None
+        if path.suffix != ".gz":
+            return path.stat().st_size
+        index = self._index(build_id)
+        if index is not None:
+            return index["size"]
+        # Compressed without an index: the ISIZE trailer is the size modulo 2**32
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return int.from_bytes(f.read(4), "little")
+
+    def _index_path(self, build_id: str) -> Path:
+        return self.root / f"{build_id}.log.idx"
+
+    def _index(self, build_id: str) -> dict | None:
+        """Size and member offsets of a compressed log, or None without an index."""
+        try:
+            index = json.loads(self._index_path(build_id).read_text(encoding="ascii"))
+            index["size"] = int(index["size"])
+            index["members"] = [(int(u), int(c)) for u, c in index["members"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return index if index["members"] else None
+
+    def _compress(self, build_id: str, path: Path, gz_path: Path) -> None:
+        """Write ``path`` as one gzip member per ``_MEMBER`` bytes, plus its index."""
+        members = []
+        size = 0
+        with open(path, "rb") as src, open(gz_path, "wb") as dst:
+            while True:
+                data = src.read(_MEMBER)
+                if not data and members:
+                    break
+                members.append((size, dst.tell()))
+                dst.write(gzip.compress(data, compresslevel=6, mtime=0))
+                size += len(data)
+        self._index_path(build_id).write_text(
+            json.dumps({"size": size, "members": members}), encoding="ascii"
+        )
+
+    def enforce_retention(self) -> None:
+        """Compress older logs and delete the oldest beyond the limits.
+
+        Blocking; run it in an executor.
+        """
+        with self._lock:
+            busy = set(self._open)
+            logs = [(b, p) for b, p in self._logs() if b not in busy]
+            for build_id, path in logs[: max(len(logs) - self.keep_plain, 0)]:
+                if path.suffix == ".gz":
+                    continue
+                gz_path = path.with_name(path.name + ".gz")
+                try:
+                    self._compress(build_id, path, gz_path)
+                    path.unlink()
+                except OSError as e:
+                    logging.warning("Cannot compress build log %s: %s", path, e)
+                    gz_path.unlink(missing_ok=True)
+                    self._index_path(build_id).unlink(missing_ok=True)
+            logs = [(b, p) for b, p in self._logs() if b not in busy]
+            sizes = []
+            for _, path in logs:
+                try:
+                    sizes.append(path.stat().st_size)
+                except OSError:
+                    sizes.append(0)
+            total = sum(sizes)
+            count = len(logs)
+            for (build_id, path), size in zip(logs, sizes):
+                if count <= self.max_builds and total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    self._index_path(build_id).unlink(missing_ok=True)
+                except OSError as e:
+                    logging.warning("Cannot delete build log %s: %s", path, e)
+                    continue
+                count -= 1
+                total -= size
+
+    def _open_read(self, path: Path):
+        return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+    def read(self, build_id: str, offset: int, length: int) -> bytes | None:
+        """Return ``length`` bytes of a log starting at ``offset``."""
+        path = self.path(build_id)
+        if path is None:
+            return None
+        offset = max(offset, 0)
+        index = self._index(build_id) if path.suffix == ".gz" else None
+        if index is not None:
+            # Start decompressing at the member holding the offset
+            starts = [u for u, _ in index["members"]]
+            start, pos = index["members"][max(bisect.bisect_right(starts, offset) - 1, 0)]
+            with open(path, "rb") as raw:
+                raw.seek(pos)
+                with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+                    f.seek(offset - start)
+                    return f.read(max(length, 0))
+        with self._open_read(path) as f:
+            f.seek(offset)
+            return f.read(max(length, 0))
+
+    def tail(self, build_id: str, lines: int) -> list[str] | None:
+        """Return the last ``lines`` lines of a log."""
+        path = self.path(build_id)
+        if path is None:
+            return None
+        index = self._index(build_id) if path.suffix == ".gz" else None
+        if index is not None:
+            # Decompress members from the end until enough lines are collected
+            members = index["members"]
+            data = b""
+            with open(path, "rb") as f:
+                end = f.seek(0, os.SEEK_END)
+                for i in range(len(members) - 1, -1, -1):
+                    if data.count(b"\n") > lines:
+                        break
+                    pos = members[i][1]
+                    stop = members[i + 1][1] if i + 1 < len(members) else end
+                    f.seek(pos)
+                    data = gzip.decompress(f.read(stop - pos)) + data
+            text = data.decode("utf-8", errors="replace").splitlines()
+            return text[-lines:] if lines > 0 else []
+        if path.suffix == ".gz":
+            # Compressed without an index: stream the whole log
+            last: deque[bytes] = deque(maxlen=max(lines, 0))
+            with gzip.open(path, "rb") as f:
+                for raw in f:
+                    last.append(raw)
+            return [raw.decode("utf-8", errors="replace").rstrip("\r\n") for raw in last]
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            data = b""
+            # One more newline than lines wanted, ignoring the trailing one
+            while pos > 0 and data.count(b"\n") <= lines:
+                step = min(_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        text = data.decode("utf-8", errors="replace").splitlines()
+        return text[-lines:] if lines > 0 else []
+
+    def grep(
+        self, build_id: str, pattern: re.Pattern[str], max_matches: int
+    ) -> tuple[list[tuple[int, str]], int] | None:
+        """Return up to ``max_matches`` (line number, line) pairs and the total match count."""
+        path = self.path(build_id)
+        if path is None:
+            return None
+        matches: list[tuple[int, str]] = []
+        total = 0
+        with self._open_read(path) as f:
+            for number, raw in enumerate(f, 1):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if pattern.search(line):
+                    total += 1
+                    if len(matches) < max_matches:
+                        matches.append((number, line))
+        return matches, total
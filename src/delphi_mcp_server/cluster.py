@@ -0,0 +1,496 @@
+"""Distribution of builds from a coordinator to worker servers.
+
+A worker is this server started with ``--worker-root``: besides the MCP
+endpoint it serves a small HTTP API under ``/worker`` (see
+``DelphiMCPServer._register_worker_routes``).  Sources are synced
+content-addressed: the coordinator sends a manifest (relative path -> SHA-256)
+and uploads only the blobs the worker does not have yet.  Each source tree
+maps to a fixed workspace directory on the worker, so DCUs and the worker's
+build cache stay warm between builds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import ctypes
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any, AsyncIterator
+
+import httpx
+
+MANIFEST_NAME = ".delphimcp-manifest.json"
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def is_digest(value: object) -> bool:
+    """True for a lowercase hex SHA-256 digest (the only valid blob name)."""
+    return isinstance(value, str) and _DIGEST_RE.fullmatch(value) is not None
+
+
+def workspace_id(sync_root: Path) -> str:
+    """Stable name of the worker workspace for a coordinator source tree."""
+    return hashlib.sha256(str(sync_root).encode("utf-8", errors="surrogateescape")).hexdigest()[:16]
+
+
+def safe_relpath(rel: str) -> PurePosixPath | None:
+    """Return a manifest path if it stays inside the workspace, else None."""
+    path = PurePosixPath(rel.replace("\\", "/"))
+    if path.is_absolute() or not path.parts or ".." in path.parts or ":" in path.parts[0]:
+        return None
+    return path
+
+
+class Workspace:
+    """Worker-side blob store and materialised source trees.
+
+    Layout below ``root``: ``blobs/<sha256>`` holds file contents,
+    ``ws/<workspace id>/`` the trees.  Only files whose digest changed since
+    they were last written are rewritten, so unchanged sources keep their
+    timestamps and compiler outputs in the tree are reused.
+
+    ``prune`` removes workspaces not synced for ``max_age`` seconds and blobs
+    no remaining workspace uses.  Blobs touched within ``blob_grace`` seconds
+    are kept, as they may belong to a build that is being synced.
+    """
+
+    def __init__(self, root: Path, max_age: float = 7 * 24 * 3600, blob_grace: float = 3600):
+        self.root = root
+        self.max_age = max_age
+        self.blob_grace = blob_grace
+        self.blobs = root / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self._locks: dict[str, asyncio.Lock] = {}
+        # Builds currently compiling in each workspace
+        self._readers: dict[str, int] = {}
+
+    def lock(self, ws_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(ws_id, asyncio.Lock())
+
+    def path(self, ws_id: str) -> Path:
+        return self.root / "ws" / ws_id
+
+    def missing(self, digests: set[str]) -> list[str]:
+        """Return the digests without a blob (blocking).
+
+        Present blobs are touched so ``prune`` keeps them until the build
+        that asked for them has synced.
+
+        Raises:
+            ValueError: A digest is not a SHA-256 hex string.
+        """
+        result = []
+        for digest in digests:
+            if not is_digest(digest):
+                raise ValueError(f"invalid digest: {str(digest)[:80]}")
+            try:
+                os.utime(self.blobs / digest)
+            except FileNotFoundError:
+                result.append(digest)
+        return sorted(result)
+
+    def put_blob(self, digest: str, data: bytes) -> bool:
+        """Store a blob; returns False if the data does not match the digest.
+
+        Raises:
+            ValueError: The digest is not a SHA-256 hex string.
+        """
+        if not is_digest(digest):
+            raise ValueError(f"invalid digest: {digest[:80]}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            return False
+        target = self.blobs / digest
+        tmp = target.with_name(f"{digest}.{secrets.token_hex(4)}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        return True
+
+    def _read_state(self, ws_id: str) -> dict[str, Any]:
+        """Files on disk (path -> digest) and each project's file list."""
+        try:
+            state = json.loads((self.path(ws_id) / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = None
+        if not isinstance(state, dict) or not isinstance(state.get("files"), dict):
+            # Missing or older format: files are re-checked against their digests
+            return {"files": {}, "projects": {}}
+        state.setdefault("projects", {})
+        return state
+
+    def _write_state(self, ws_id: str, state: dict[str, Any]) -> None:
+        (self.path(ws_id) / MANIFEST_NAME).write_text(json.dumps(state), encoding="utf-8")
+
+    def materialize(self, ws_id: str, project: str, manifest: dict[str, str]) -> Path:
+        """Bring a project's files in a workspace in line with its manifest (blocking).
+
+        Projects below the same sync root share a workspace (and the DCUs of
+        shared units), so a file is only deleted once no project's latest
+        manifest lists it, and only while no build in the workspace is
+        running (see ``enter``/``leave``).  Hold the workspace lock.
+
+        Raises:
+            ValueError: A path escapes the workspace or a blob is missing.
+        """
+        base = self.path(ws_id)
+        base.mkdir(parents=True, exist_ok=True)
+        state = self._read_state(ws_id)
+        files: dict[str, str] = state["files"]
+        for rel, digest in manifest.items():
+            path = safe_relpath(rel)
+            if path is None:
+                raise ValueError(f"invalid path in manifest: {rel}")
+            if not is_digest(digest):
+                raise ValueError(f"invalid digest in manifest for {rel}")
+            target = base / path
+            if files.get(rel) == digest and target.is_file():
+                continue
+            blob = self.blobs / digest
+            if not blob.is_file():
+                raise ValueError(f"missing blob for {rel}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(blob, target)
+            files[rel] = digest
+        state["projects"][project] = sorted(manifest)
+        if not self._readers.get(ws_id):
+            self._remove_orphans(ws_id, state)
+        self._write_state(ws_id, state)
+        return base
+
+    def _remove_orphans(self, ws_id: str, state: dict[str, Any]) -> None:
+        listed = {rel for rels in state["projects"].values() for rel in rels}
+        for rel in set(state["files"]) - listed:
+            path = safe_relpath(rel)
+            if path is not None:
+                (self.path(ws_id) / path).unlink(missing_ok=True)
+            del state["files"][rel]
+
+    def enter(self, ws_id: str) -> None:
+        """Register a build reading the workspace (hold the workspace lock)."""
+        self._readers[ws_id] = self._readers.get(ws_id, 0) + 1
+
+    def leave(self, ws_id: str) -> None:
+        """Unregister a build; the last one out deletes files no project lists (blocking)."""
+        self._readers[ws_id] -= 1
+        if not self._readers[ws_id]:
+            del self._readers[ws_id]
+            try:
+                state = self._read_state(ws_id)
+                self._remove_orphans(ws_id, state)
+                self._write_state(ws_id, state)
+            except OSError as e:
+                logging.warning("Cannot clean up workspace %s: %s", ws_id, e)
+
+    def stale(self) -> list[str]:
+        """Ids of workspaces not synced for ``max_age`` seconds."""
+        cutoff = time.time() - self.max_age
+        result = []
+        for ws in (self.root / "ws").glob("*"):
+            state_file = ws / MANIFEST_NAME
+            try:
+                synced = (state_file if state_file.exists() else ws).stat().st_mtime
+            except OSError:
+                continue
+            if synced < cutoff:
+                result.append(ws.name)
+        return result
+
+    def remove(self, ws_id: str) -> None:
+        """Delete a workspace if it is still stale and idle (blocking; hold its lock)."""
+        if ws_id in self.stale() and not self._readers.get(ws_id):
+            logging.info("Removing unused worker workspace %s", ws_id)
+            shutil.rmtree(self.path(ws_id), ignore_errors=True)
+            self._locks.pop(ws_id, None)
+
+    def prune_blobs(self) -> int:
+        """Delete blobs no workspace manifest refers to; returns the bytes freed."""
+        used: set[str] = set()
+        for state_file in (self.root / "ws").glob(f"*/{MANIFEST_NAME}"):
+            try:
+                used.update(json.loads(state_file.read_text(encoding="utf-8"))["files"].values())
+            except (OSError, ValueError, AttributeError, KeyError, TypeError):
+                # Unreadable manifest: keep everything rather than break that workspace
+                return 0
+        cutoff = time.time() - self.blob_grace
+        freed = 0
+        for blob in self.blobs.iterdir():
+            if blob.name in used:
+                continue
+            try:
+                stat = blob.stat()
+                if stat.st_mtime < cutoff:
+                    blob.unlink()
+                    freed += stat.st_size
+            except OSError:
+                continue
+        return freed
+
+
+@dataclass
+class WorkerState:
+    """What the coordinator knows about one worker."""
+
+    url: str
+    healthy: bool = True
+    checked: float = 0.0
+    capacity: int = 1
+    reported_load: int = 0
+    inflight: int = 0
+    warm: set[str] = field(default_factory=set)
+    failures: int = 0
+
+    @property
+    def load(self) -> float:
+        return max(self.inflight, self.reported_load) / max(self.capacity, 1)
+
+
+class RemoteBuildError(Exception):
+    """A worker could not be reached or broke off a build."""
+
+
+class MissingBlobsError(RemoteBuildError):
+    """A worker no longer has blobs the coordinator believed it had."""
+
+
+class WorkerPool:
+    """Registered workers, their health and the choice of worker per build.
+
+    * Workers are polled (``GET /worker/status``) every ``health_interval``
+      seconds; a failed poll or request marks a worker unhealthy until a
+      later poll succeeds.
+    * A build goes to a healthy worker that already built the project
+      ("warm": DCUs and build cache present) if one has a free slot,
+      otherwise to the least-loaded healthy worker.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        token: str | None = None,
+        health_interval: float = 5.0,
+        wait_for_worker: float = 30.0,
+    ):
+        self.workers = [WorkerState(u.rstrip("/")) for u in urls]
+        self.token = token
+        self.health_interval = health_interval
+        self.wait_for_worker = wait_for_worker
+        self._client: httpx.AsyncClient | None = None
+        self._monitor: asyncio.Task | None = None
+        # Blobs each worker is known to hold, to skip the upload round trip
+        self._known_blobs: dict[str, set[str]] = {w.url: set() for w in self.workers}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Created lazily so it binds to the running event loop
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._client = httpx.AsyncClient(headers=headers, timeout=httpx.Timeout(30.0, read=None))
+        return self._client
+
+    async def refresh(self, worker: WorkerState) -> None:
+        try:
+            resp = await self.client.get(f"{worker.url}/worker/status", timeout=5.0)
+            resp.raise_for_status()
+            status = resp.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if worker.healthy:
+                logging.warning("Worker %s unhealthy: %s", worker.url, e)
+            worker.healthy = False
+            worker.failures += 1
+        else:
+            if not worker.healthy:
+                logging.info("Worker %s healthy again", worker.url)
+            worker.healthy = True
+            worker.capacity = int(status.get("max_workers", 1))
+            worker.reported_load = int(status.get("queued", 0)) + int(status.get("active", 0))
+            worker.warm = set(status.get("warm", []))
+        worker.checked = time.monotonic()
+
+    async def _monitor_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.refresh(w) for w in self.workers))
+            await asyncio.sleep(self.health_interval)
+
+    def _start_monitor(self) -> None:
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.ensure_future(self._monitor_loop())
+
+    def choose(self, warm_key: str, exclude: set[str]) -> WorkerState | None:
+        healthy = [w for w in self.workers if w.healthy and w.checked and w.url not in exclude]
+        if not healthy:
+            return None
+        warm = [w for w in healthy if warm_key in w.warm and w.load < 1.0]
+        return min(warm or healthy, key=lambda w: (w.load, w.inflight))
+
+    async def acquire(self, warm_key: str, exclude: set[str]) -> WorkerState | None:
+        """Pick a worker, waiting up to ``wait_for_worker`` for one to become healthy."""
+        self._start_monitor()
+        deadline = time.monotonic() + self.wait_for_worker
+        while True:
+            worker = self.choose(warm_key, exclude)
+            if worker is not None:
+                worker.inflight += 1
+                return worker
+            candidates = [w for w in self.workers if w.url not in exclude]
+            if not candidates or time.monotonic() > deadline:
+                return None
+            await asyncio.gather(*(self.refresh(w) for w in candidates))
+            if self.choose(warm_key, exclude) is None:
+                await asyncio.sleep(0.5)
+
+    def release(self, worker: WorkerState) -> None:
+        worker.inflight -= 1
+
+    def mark_failed(self, worker: WorkerState, error: Exception) -> None:
+        logging.warning("Build on worker %s failed: %s", worker.url, error)
+        worker.healthy = False
+        worker.failures += 1
+        self._known_blobs[worker.url].clear()
+
+    def forget_blobs(self, worker: WorkerState) -> None:
+        """Ask the worker about every blob again on the next sync."""
+        self._known_blobs[worker.url].clear()
+
+    async def sync(self, worker: WorkerState, manifest: dict[str, str], files: dict[str, str]) -> int:
+        """Upload the blobs of a manifest the worker lacks; returns bytes sent."""
+        known = self._known_blobs[worker.url]
+        unknown = {d for d in manifest.values() if d not in known}
+        if not unknown:
+            return 0
+        try:
+            resp = await self.client.post(
+                f"{worker.url}/worker/missing", json={"digests": sorted(unknown)}
+            )
+            resp.raise_for_status()
+            missing = set(resp.json()["missing"])
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            raise RemoteBuildError(f"sync failed: {e}") from e
+        by_digest = {d: files[rel] for rel, d in manifest.items()}
+        sent = 0
+        for digest in sorted(missing):
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, Path(by_digest[digest]).read_bytes)
+            try:
+                resp = await self.client.put(f"{worker.url}/worker/blob/{digest}", content=data)
+                resp.raise_for_status()
+            except httpx.HTTPError as e:
+                raise RemoteBuildError(f"upload failed: {e}") from e
+            sent += len(data)
+        known.update(unknown)
+        return sent
+
+    async def build(self, worker: WorkerState, request: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        """Run a build on a worker and yield its progress and result events."""
+        try:
+            async with self.client.stream("POST", f"{worker.url}/worker/build", json=request) as resp:
+                if resp.status_code == 409:
+                    raise MissingBlobsError("worker is missing blobs")
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    raise RemoteBuildError(f"HTTP {resp.status_code}: {body}")
+                async for line in resp.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+        except (httpx.HTTPError, ValueError) as e:
+            raise RemoteBuildError(str(e)) from e
+
+    async def fetch_log(self, url: str, params: dict[str, Any]) -> str:
+        try:
+            resp = await self.client.get(f"{url}/worker/log", params=params)
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            return f"ERROR: Cannot read log from worker {url}: {e}"
+        return resp.text
+
+    async def close(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _die_with_parent() -> None:
+    """Ask Linux to send SIGTERM to this process when its parent dies (preexec_fn)."""
+    PR_SET_PDEATHSIG = 1
+    try:
+        ctypes.CDLL(None).prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except (OSError, AttributeError):
+        pass
+
+
+def spawn_local_workers(
+    count: int,
+    base_dir: Path,
+    token: str,
+    extra_args: list[str] | None = None,
+) -> list[str]:
+    """Start ``count`` worker servers on this machine; returns their URLs.
+
+    The processes are terminated when the coordinator exits, including on
+    SIGTERM.  On Linux they also get SIGTERM if the coordinator is killed
+    outright.  Must be called from the main thread.
+    """
+    urls = []
+    procs: list[subprocess.Popen] = []
+    for i in range(count):
+        root = base_dir / f"worker{i}"
+        root.mkdir(parents=True, exist_ok=True)
+        port = _free_port()
+        cmd = [
+            sys.executable, "-m", "delphi_mcp_server.main",
+            "--transport", "http", "--host", "127.0.0.1", "--port", str(port),
+            "--worker-root", str(root),
+            "--log-file", str(root / "server.log"),
+            *(extra_args or []),
+        ]
+        env = dict(os.environ, DELPHI_MCP_WORKER_TOKEN=token)
+        procs.append(subprocess.Popen(
+            cmd, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            preexec_fn=_die_with_parent if sys.platform.startswith("linux") else None,
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+        logging.info("Started local worker %s (pid %s)", urls[-1], procs[-1].pid)
+
+    lock = threading.Lock()
+
+    def stop() -> None:
+        with lock:
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.terminate()
+            for proc in procs:
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+            procs.clear()
+
+    def on_sigterm(signum: int, frame: Any) -> None:
+        # atexit handlers do not run when the default SIGTERM action kills us
+        stop()
+        sys.exit(128 + signum)
+
+    atexit.register(stop)
+    if signal.getsignal(signal.SIGTERM) in (signal.SIG_DFL, None):
+        signal.signal(signal.SIGTERM, on_sigterm)
+    return urls
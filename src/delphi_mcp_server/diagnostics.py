@@ -0,0 +1,163 @@
+"""Parsing and storage of dcc/msbuild diagnostics."""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+SEVERITIES = ("error", "warning", "hint")
+
+# The file may contain parentheses ("Program Files (x86)"); the lazy match
+# makes the location the first "(line[,col])" followed by the severity part.
+_LOC = r"(?P<file>[^\[\]]+?)\((?P<line>\d+)(?:,(?P<col>\d+))?\)"
+_CODE = r"(?P<code>[EWHF]\d{4})"
+
+_PATTERNS = (
+    # Unit1.pas(12) Error: E2003 Undeclared identifier: 'Foo'
+    re.compile(
+        rf"^\s*{_LOC}:?\s+(?P<sev>Error|Warning|Hint|Fatal):\s*(?:{_CODE}\s+)?(?P<msg>.*)$",
+        re.IGNORECASE,
+    ),
+    # [dcc32 Error] Unit1.pas(12): E2003 Undeclared identifier: 'Foo'
+    re.compile(
+        rf"^\s*\[dcc\w*\s+(?P<sev>Error|Warning|Hint|Fatal)(?: Error)?\]\s*"
+        rf"(?:{_LOC}:\s*)?(?:{_CODE}\s+)?(?P<msg>.*)$",
+        re.IGNORECASE,
+    ),
+    # Fatal: F1026 File not found: 'Foo.dcu'
+    # (before the msbuild form, whose file part is optional)
+    re.compile(
+        rf"^\s*(?P<sev>Error|Warning|Hint|Fatal):\s*(?:{_CODE}\s+)?(?P<msg>.*)$",
+        re.IGNORECASE,
+    ),
+    # C:\src\Unit1.pas(12,5): error E2003: Undeclared identifier: 'Foo' [C:\src\P.dproj]
+    # C:\src\P.dproj : error MSB4025: The project file could not be loaded.
+    # EXEC : error : The command "..." exited with code 1.
+    re.compile(
+        r"^\s*(?:(?P<file>[^\[\]]+?)(?:\((?P<line>\d+)(?:,(?P<col>\d+))?\))?\s*:\s*)?"
+        r"(?P<sev>error|warning|hint|fatal)\s*(?:(?P<code>[A-Z]+\d+)\s*)?:\s*(?P<msg>.*?)"
+        r"(?:\s+\[[^\]]+\])?\s*$",
+        re.IGNORECASE,
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    """A single compiler message."""
+
+    severity: str
+    code: str | None
+    message: str
+    file: str | None = None
+    line: int | None = None
+    column: int | None = None
+
+    def dedup_key(self) -> tuple:
+        """Identity used to drop repeats (msbuild prints diagnostics twice).
+
+        The file is reduced to its name and the column ignored because dcc and
+        msbuild report the same message with different path/column detail.
+        """
+        name = self.file.replace("\\", "/").rsplit("/", 1)[-1].lower() if self.file else None
+        return (self.severity, self.code, name, self.line, self.message)
+
+    def format(self) -> str:
+        loc = ""
+        if self.file:
+            pos = f"{self.line},{self.column}" if self.column else f"{self.line}"
+            loc = f"{self.file}({pos}): " if self.line else f"{self.file}: "
+        code = f" {self.code}" if self.code else ""
+        return f"{loc}{self.severity}{code}: {self.message}"
+
+
+def parse_line(line: str) -> Diagnostic | None:
+    """Parse one line of dcc or msbuild output into a diagnostic."""
+    # Cheap pre-filter: every diagnostic names its severity
+    lower = line.lower()
+    if not any(s in lower for s in ("error", "warning", "hint", "fatal")):
+        return None
+    for pattern in _PATTERNS:
+        m = pattern.match(line)
+        if not m:
+            continue
+        severity = m.group("sev").lower()
+        if severity == "fatal":
+            severity = "error"
+        groups = m.groupdict()
+        file = (groups.get("file") or "").strip() or None
+        line_no = groups.get("line")
+        col = groups.get("col")
+        return Diagnostic(
+            severity=severity,
+            code=groups.get("code"),
+            message=m.group("msg").strip(),
+            file=file,
+            line=int(line_no) if line_no else None,
+            column=int(col) if col else None,
+        )
+    return None
+
+
+class DiagnosticsStore:
+    """Diagnostics of recent builds, keyed by build id.
+
+    The oldest builds are dropped once more than ``max_builds`` builds or
+    ``max_records`` diagnostics in total are stored.
+    """
+
+    def __init__(self, max_builds: int = 50, max_records: int = 100_000):
+        self.max_builds = max_builds
+        self.max_records = max_records
+        self._builds: OrderedDict[str, list[Diagnostic]] = OrderedDict()
+        self._records = 0
+        self._lock = threading.Lock()
+
+    def add(self, build_id: str, diagnostics: list[Diagnostic]) -> None:
+        with self._lock:
+            old = self._builds.pop(build_id, None)
+            if old is not None:
+                self._records -= len(old)
+            self._builds[build_id] = diagnostics
+            self._records += len(diagnostics)
+            while len(self._builds) > 1 and (
+                len(self._builds) > self.max_builds or self._records > self.max_records
+            ):
+                _, dropped = self._builds.popitem(last=False)
+                self._records -= len(dropped)
+
+    def latest_build(self) -> str | None:
+        with self._lock:
+            return next(reversed(self._builds), None)
+
+    def query(
+        self,
+        build_id: str,
+        severity: str | None = None,
+        file: str | None = None,
+        code: str | None = None,
+    ) -> list[Diagnostic] | None:
+        """Return the matching diagnostics of a build, or None if it is unknown.
+
+        ``file`` matches any part of the path (case-insensitive); ``severity``
+        and ``code`` match exactly (case-insensitive).
+        """
+        with self._lock:
+            records = self._builds.get(build_id)
+        if records is None:
+            return None
+        severity = severity.lower() if severity else None
+        code = code.upper() if code else None
+        file = file.lower().replace("\\", "/") if file else None
+        result = []
+        for d in records:
+            if severity and d.severity != severity:
+                continue
+            if code and (d.code or "").upper() != code:
+                continue
+            if file and (not d.file or file not in d.file.lower().replace("\\", "/")):
+                continue
+            result.append(d)
+        return result
@@ -0,0 +1,176 @@
+"""Indexed discovery of Delphi projects below a root directory."""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+PROJECT_EXTENSIONS = (".dproj", ".dpr")
+
+# Directories that never contain projects worth building: VCS metadata, IDE
+# backup folders, compiler output and vendored package trees.
+DEFAULT_IGNORES = (
+    ".git",
+    ".svn",
+    ".hg",
+    "__history",
+    "__recovery",
+    "__pycache__",
+    "node_modules",
+    "bower_components",
+    ".venv",
+    "venv",
+    "dcu",
+    "Win32",
+    "Win64",
+    "Win64x",
+    "Linux64",
+    "OSX64",
+    "OSXARM64",
+    "Android",
+    "Android64",
+    "iOSDevice64",
+    "iOSSimARM64",
+)
+
+# Ignore files read from the index root, in addition to DEFAULT_IGNORES
+IGNORE_FILES = (".gitignore", ".delphimcpignore")
+
+
+def project_sort_key(
+    path: Path, root: Path, extensions: tuple[str, ...] = PROJECT_EXTENSIONS
+) -> tuple[int, int, str]:
+    """Ranking used when several projects match.
+
+    ``.dproj`` files win over ``.dpr`` files, then the project closest to the
+    root wins, then the case-insensitive relative path decides.
+    """
+    rel = path.relative_to(root)
+    return (
+        extensions.index(path.suffix.lower()),
+        len(rel.parts),
+        rel.as_posix().lower(),
+    )
+
+
+@dataclass
+class _DirEntry:
+    mtime_ns: int
+    projects: list[str] = field(default_factory=list)
+    subdirs: list[str] = field(default_factory=list)
+
+
+class ProjectIndex:
+    """Pruned, incrementally refreshed index of project files under ``root``.
+
+    Files with other ``extensions`` (e.g. unit sources) can be indexed the same
+    way; they are ranked in the order of that tuple.
+
+    The first refresh performs a single ``os.scandir`` walk that skips ignored
+    directories.  Later refreshes only re-list directories whose mtime changed
+    (adding or removing an entry updates the mtime of its parent directory);
+    unchanged directories cost one ``stat`` call.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ignores: tuple[str, ...] = DEFAULT_IGNORES,
+        extensions: tuple[str, ...] = PROJECT_EXTENSIONS,
+    ):
+        self.root = root
+        self.extensions = extensions
+        self._base_ignores = ignores
+        self._patterns: list[str] = []
+        self._ignore_stamp: tuple[int, ...] | None = None
+        self._dirs: dict[str, _DirEntry] = {}
+        self._lock = threading.Lock()
+
+    def _load_ignore_patterns(self) -> None:
+        stamp = []
+        for name in IGNORE_FILES:
+            try:
+                stamp.append(os.stat(self.root / name).st_mtime_ns)
+            except OSError:
+                stamp.append(0)
+        if tuple(stamp) == self._ignore_stamp:
+            return
+        patterns = list(self._base_ignores)
+        for name in IGNORE_FILES:
+            try:
+                text = (self.root / name).read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                continue
+            for line in text.splitlines():
+                line = line.strip()
+                # Negations are not supported; they only re-include files
+                if not line or line.startswith(("#", "!")):
+                    continue
+                patterns.append(line.rstrip("/").lstrip("/"))
+        if self._ignore_stamp is not None:
+            # Rules changed: the cached directory tree may be stale
+            self._dirs.clear()
+        self._patterns = patterns
+        self._ignore_stamp = tuple(stamp)
+
+    def _ignored(self, name: str, rel: str) -> bool:
+        for pattern in self._patterns:
+            if "/" in pattern:
+                if fnmatch.fnmatch(rel, pattern):
+                    return True
+            elif fnmatch.fnmatch(name, pattern):
+                return True
+        return False
+
+    def _scan_dir(self, path: str, rel: str, mtime_ns: int) -> _DirEntry:
+        entry = _DirEntry(mtime_ns)
+        try:
+            it = os.scandir(path)
+        except OSError:
+            return entry
+        with it:
+            for de in it:
+                child_rel = f"{rel}/{de.name}" if rel else de.name
+                try:
+                    if de.is_dir(follow_symlinks=False):
+                        if not self._ignored(de.name, child_rel):
+                            entry.subdirs.append(de.name)
+                    elif os.path.splitext(de.name)[1].lower() in self.extensions:
+                        if not self._ignored(de.name, child_rel):
+                            entry.projects.append(de.name)
+                except OSError:
+                    continue
+        return entry
+
+    def refresh(self) -> list[Path]:
+        """Bring the index up to date and return all projects in ranked order."""
+        with self._lock:
+            self._load_ignore_patterns()
+            seen: dict[str, _DirEntry] = {}
+            projects: list[Path] = []
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                path = os.path.join(self.root, rel) if rel else str(self.root)
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                entry = self._dirs.get(rel)
+                if entry is None or entry.mtime_ns != mtime_ns:
+                    entry = self._scan_dir(path, rel, mtime_ns)
+                seen[rel] = entry
+                base = self.root / rel if rel else self.root
+                projects.extend(base / name for name in entry.projects)
+                stack.extend(f"{rel}/{d}" if rel else d for d in entry.subdirs)
+            self._dirs = seen
+            projects.sort(key=lambda p: project_sort_key(p, self.root, self.extensions))
+            return list(projects)
+
+    def best(self) -> Path | None:
+        """Return the preferred project (see ``project_sort_key``)."""
+        projects = self.refresh()
+        return projects[0] if projects else None
@@ -0,0 +1,352 @@
+"""Evaluated, cached model of Delphi .dproj files.
+
+RAD Studio encodes configuration inheritance (``Base`` -> ``Cfg_1`` ->
+``Cfg_1_Win32`` ...) through MSBuild ``Condition`` attributes on flag
+properties such as ``'$(Cfg_1_Win32)'!=''``.  The model sets those flags for
+the selected configuration's chain (taken from the ``BuildConfiguration``
+items) and then evaluates the property groups in document order, the way
+MSBuild does, expanding ``$(Property)`` references as it goes.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_NS = "{http://schemas.microsoft.com/developer/msbuild/2003}"
+_PROP_RE = re.compile(r"\$\(([A-Za-z_][\w.\-]*)\)")
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<str>'[^']*')|(?P<op>==|!=|<=|>=|<|>|!|\(|\)|,)|(?P<word>(?:\$\([^)]*\)|[^\s'=!<>(),])+))"
+)
+
+
+def _local(tag: str) -> str:
+    return tag[len(_NS):] if tag.startswith(_NS) else tag
+
+
+class _Properties:
+    """Case-insensitive MSBuild property bag with environment fallback."""
+
+    def __init__(self, initial: dict[str, str], global_names: set[str]):
+        self._values = {k.lower(): v for k, v in initial.items()}
+        self._global = {n.lower() for n in global_names}
+        self._env = {k.lower(): v for k, v in os.environ.items()}
+
+    def get(self, name: str) -> str:
+        key = name.lower()
+        if key in self._values:
+            return self._values[key]
+        return self._env.get(key, "")
+
+    def set(self, name: str, value: str) -> None:
+        # Global properties (Config/Platform from the command line) are read-only
+        if name.lower() not in self._global:
+            self._values[name.lower()] = value
+
+    def expand(self, text: str) -> str:
+        return _PROP_RE.sub(lambda m: self.get(m.group(1)), text)
+
+    def as_dict(self) -> dict[str, str]:
+        return dict(self._values)
+
+
+class _Condition:
+    """Recursive-descent evaluator for MSBuild condition expressions."""
+
+    def __init__(self, text: str, props: _Properties, base_dir: Path):
+        self.tokens = [
+            (m.lastgroup, m.group(m.lastgroup))
+            for m in _TOKEN_RE.finditer(text)
+            if m.lastgroup
+        ]
+        self.pos = 0
+        self.props = props
+        self.base_dir = base_dir
+
+    def _peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> tuple[str, str]:
+        tok = self._peek()
+        if tok is None:
+            raise ValueError("unexpected end of condition")
+        self.pos += 1
+        return tok
+
+    def _is_word(self, word: str) -> bool:
+        tok = self._peek()
+        return tok is not None and tok[0] == "word" and tok[1].lower() == word
+
+    def evaluate(self) -> bool:
+        result = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"unexpected token {self._peek()[1]!r}")
+        return result
+
+    def _or(self) -> bool:
+        value = self._and()
+        while self._is_word("or"):
+            self._next()
+            rhs = self._and()
+            value = value or rhs
+        return value
+
+    def _and(self) -> bool:
+        value = self._unary()
+        while self._is_word("and"):
+            self._next()
+            rhs = self._unary()
+            value = value and rhs
+        return value
+
+    def _unary(self) -> bool:
+        tok = self._peek()
+        if tok == ("op", "!"):
+            self._next()
+            return not self._unary()
+        if tok == ("op", "("):
+            self._next()
+            value = self._or()
+            if self._next() != ("op", ")"):
+                raise ValueError("expected ')'")
+            return value
+        return self._comparison()
+
+    def _operand(self) -> str:
+        kind, text = self._next()
+        if kind == "str":
+            return self.props.expand(text[1:-1])
+        if kind == "word":
+            if self._peek() == ("op", "("):
+                return self._function(text)
+            return self.props.expand(text)
+        raise ValueError(f"unexpected token {text!r}")
+
+    def _function(self, name: str) -> str:
+        self._next()  # "("
+        args = []
+        while self._peek() != ("op", ")"):
+            args.append(self._operand())
+            if self._peek() == ("op", ","):
+                self._next()
+        self._next()  # ")"
+        lname = name.lower()
+        if lname == "exists":
+            path = args[0].replace("\\", "/") if args else ""
+            exists = bool(path) and (self.base_dir / path).exists()
+            return "true" if exists else "false"
+        if lname == "hastrailingslash":
+            return "true" if args and args[0].endswith(("/", "\\")) else "false"
+        return ""
+
+    def _comparison(self) -> bool:
+        lhs = self._operand()
+        tok = self._peek()
+        if tok is None or tok[0] != "op" or tok[1] not in ("==", "!=", "<", ">", "<=", ">="):
+            return lhs.lower() == "true"
+        op = self._next()[1]
+        rhs = self._operand()
+        if op == "==":
+            return lhs.lower() == rhs.lower()
+        if op == "!=":
+            return lhs.lower() != rhs.lower()
+        try:
+            a, b = float(lhs), float(rhs)
+        except ValueError:
+            return False
+        return {"<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+
+
+def evaluate_condition(text: str, props: _Properties, base_dir: Path) -> bool:
+    """Evaluate an MSBuild condition; malformed conditions count as false."""
+    if not text.strip():
+        return True
+    try:
+        return _Condition(text, props, base_dir).evaluate()
+    except (ValueError, IndexError):
+        return False
+
+
+def _split_list(value: str | None) -> list[str]:
+    if not value:
+        return []
+    return [p.strip() for p in value.split(";") if p.strip() and not _PROP_RE.fullmatch(p.strip())]
+
+
+@dataclass(frozen=True)
+class ProjectSettings:
+    """Effective properties of a project for one platform/config."""
+
+    project: Path
+    platform: str
+    config: str
+    properties: dict[str, str] = field(repr=False)
+    units: tuple[Path, ...] = ()
+
+    def get(self, name: str) -> str | None:
+        """Return a property value (case-insensitive), None if unset or empty."""
+        return self.properties.get(name.lower()) or None
+
+    def _path(self, name: str) -> Path | None:
+        value = self.get(name)
+        return self.project.parent / value.replace("\\", "/") if value else None
+
+    @property
+    def main_source(self) -> Path | None:
+        return self._path("MainSource")
+
+    @property
+    def exe_output(self) -> Path | None:
+        return self._path("DCC_ExeOutput")
+
+    @property
+    def dcu_output(self) -> Path | None:
+        return self._path("DCC_DcuOutput")
+
+    @property
+    def bpl_output(self) -> Path | None:
+        return self._path("DCC_BplOutput")
+
+    @property
+    def search_paths(self) -> list[str]:
+        return _split_list(self.get("DCC_UnitSearchPath"))
+
+    @property
+    def defines(self) -> list[str]:
+        return _split_list(self.get("DCC_Define"))
+
+    @property
+    def namespaces(self) -> list[str]:
+        return _split_list(self.get("DCC_Namespace"))
+
+    @property
+    def packages(self) -> list[str]:
+        return _split_list(self.get("DCC_UsePackage"))
+
+
+class DelphiProject:
+    """A parsed .dproj; settings are evaluated lazily per platform/config."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._root = ET.parse(path).getroot()
+        self._settings: dict[tuple[str, str], ProjectSettings] = {}
+        self._lock = threading.Lock()
+        # BuildConfiguration items: config name -> key, key -> parent key
+        self._config_keys: dict[str, str] = {}
+        self._parents: dict[str, str] = {}
+        for item in self._root.iter(f"{_NS}BuildConfiguration"):
+            key = item.findtext(f"{_NS}Key")
+            if not key:
+                continue
+            self._config_keys[item.attrib.get("Include", "").lower()] = key
+            parent = item.findtext(f"{_NS}CfgParent")
+            if parent:
+                self._parents[key] = parent
+
+    def config_chain(self, config: str) -> list[str]:
+        """Return the configuration keys a config inherits from, e.g. ["Cfg_1", "Base"]."""
+        key = self._config_keys.get(config.lower())
+        if key is None:
+            return ["Base"] if "base" in self._config_keys else []
+        chain: list[str] = []
+        while key and key not in chain:
+            chain.append(key)
+            key = self._parents.get(key)
+        return chain
+
+    def settings(self, platform: str, config: str) -> ProjectSettings:
+        key = (platform.lower(), config.lower())
+        with self._lock:
+            cached = self._settings.get(key)
+            if cached is None:
+                cached = self._settings[key] = self._evaluate(platform, config)
+            return cached
+
+    def _evaluate(self, platform: str, config: str) -> ProjectSettings:
+        base_dir = self.path.parent
+        props = _Properties(
+            {
+                "Config": config,
+                "Platform": platform,
+                "MSBuildProjectName": self.path.stem,
+                "MSBuildProjectFile": self.path.name,
+                "MSBuildProjectDirectory": str(base_dir),
+                "MSBuildThisFileDirectory": str(base_dir) + os.sep,
+            },
+            {"Config", "Platform"},
+        )
+        # Flags of the inheritance chain, e.g. Cfg_1, Cfg_1_Win32, Base, Base_Win32
+        suffix = platform.replace(" ", "_")
+        for key in self.config_chain(config):
+            props.set(key, "true")
+            props.set(f"{key}_{suffix}", "true")
+        # Pass 1: properties in document order
+        for group in self._root:
+            if _local(group.tag) != "PropertyGroup":
+                continue
+            if not evaluate_condition(group.attrib.get("Condition", ""), props, base_dir):
+                continue
+            for prop in group:
+                if not isinstance(prop.tag, str):
+                    continue
+                if not evaluate_condition(prop.attrib.get("Condition", ""), props, base_dir):
+                    continue
+                props.set(_local(prop.tag), props.expand(prop.text or "").strip())
+        # Pass 2: unit references
+        units = []
+        for group in self._root:
+            if _local(group.tag) != "ItemGroup":
+                continue
+            if not evaluate_condition(group.attrib.get("Condition", ""), props, base_dir):
+                continue
+            for item in group:
+                if not isinstance(item.tag, str) or _local(item.tag) != "DCCReference":
+                    continue
+                if not evaluate_condition(item.attrib.get("Condition", ""), props, base_dir):
+                    continue
+                include = props.expand(item.attrib.get("Include", ""))
+                if include:
+                    units.append(base_dir / include.replace("\\", "/"))
+        return ProjectSettings(self.path, platform, config, props.as_dict(), tuple(units))
+
+
+class ProjectModelCache:
+    """Parsed projects keyed by path, reloaded when mtime or size change."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[tuple[int, int], DelphiProject]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path: Path) -> DelphiProject:
+        """Return the model of a .dproj file.
+
+        Raises:
+            OSError: The file cannot be read.
+            ET.ParseError: The file is not valid XML.
+        """
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return entry[1]
+        project = DelphiProject(Path(key))
+        with self._lock:
+            self._entries[key] = (stamp, project)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return project
+
+    def settings(self, path: Path, platform: str, config: str) -> ProjectSettings:
+        """Shortcut for ``load(path).settings(platform, config)``."""
+        return self.load(path).settings(platform, config)
@@ -0,0 +1,111 @@
+"""RAD Studio project group (.groupproj) parsing."""
+
+from __future__ import annotations
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MSBUILD_NS = {"msb": "http://schemas.microsoft.com/developer/msbuild/2003"}
+
+_COMMENT_RE = re.compile(r"\{[^}]*\}|\(\*.*?\*\)|//[^\n]*", re.DOTALL)
+_REQUIRES_RE = re.compile(r"\brequires\b(.*?);", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class GroupNode:
+    """A project of a group and the projects it must be built after."""
+
+    path: Path
+    dependencies: set[Path] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+def _norm(path: Path) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def package_requires(project: Path) -> list[str]:
+    """Return the package names from the ``requires`` clause of a package.
+
+    The ``.dpk`` next to the project (same name) is read; projects that are
+    not packages return an empty list.
+    """
+    dpk = project.with_suffix(".dpk")
+    try:
+        text = dpk.read_text(encoding="utf-8-sig", errors="ignore")
+    except OSError:
+        return []
+    m = _REQUIRES_RE.search(_COMMENT_RE.sub(" ", text))
+    if not m:
+        return []
+    return [name.strip() for name in m.group(1).split(",") if name.strip()]
+
+
+def parse_groupproj(path: Path) -> list[GroupNode]:
+    """Parse a ``.groupproj`` file into nodes with resolved dependencies.
+
+    Dependencies come from the ``Dependencies`` metadata of each
+    ``Projects`` item and from the ``requires`` clause of packages that are
+    part of the same group.
+
+    Raises:
+        ET.ParseError: The file is not valid XML.
+    """
+    root = ET.parse(path).getroot()
+    base = path.parent
+    nodes: list[GroupNode] = []
+    declared: list[list[str]] = []
+    for item in root.iterfind("msb:ItemGroup/msb:Projects", MSBUILD_NS):
+        include = item.attrib.get("Include")
+        if not include:
+            continue
+        nodes.append(GroupNode(base / include.replace("\\", "/")))
+        deps = item.findtext("msb:Dependencies", default="", namespaces=MSBUILD_NS)
+        declared.append([d.strip() for d in deps.split(";") if d.strip()])
+
+    by_path = {_norm(n.path): n for n in nodes}
+    by_name = {n.path.stem.lower(): n for n in nodes}
+    for node, deps in zip(nodes, declared):
+        for dep in deps:
+            target = by_path.get(_norm(base / dep.replace("\\", "/")))
+            if target is not None and target is not node:
+                node.dependencies.add(target.path)
+        for package in package_requires(node.path):
+            target = by_name.get(package.lower())
+            if target is not None and target is not node:
+                node.dependencies.add(target.path)
+    return nodes
+
+
+def find_cycle(nodes: list[GroupNode]) -> list[Path] | None:
+    """Return a dependency cycle if there is one."""
+    by_path = {n.path: n for n in nodes}
+    state: dict[Path, int] = {}  # 1 = visiting, 2 = done
+    stack: list[Path] = []
+
+    def visit(p: Path) -> list[Path] | None:
+        state[p] = 1
+        stack.append(p)
+        for dep in sorted(by_path[p].dependencies):
+            if state.get(dep) == 1:
+                return stack[stack.index(dep):] + [dep]
+            if dep not in state:
+                cycle = visit(dep)
+                if cycle:
+                    return cycle
+        stack.pop()
+        state[p] = 2
+        return None
+
+    for n in nodes:
+        if n.path not in state:
+            cycle = visit(n.path)
+            if cycle:
+                return cycle
+    return None
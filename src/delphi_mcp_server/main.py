@@ -1,12 +1,26 @@
 """Main entry point for the Delphi MCP Server."""
 
 import argparse
+import ipaddress
+import os
+import secrets
 import sys
+import tempfile
 from pathlib import Path
 
+from .cluster import spawn_local_workers
 from .server import DelphiMCPServer
 
 
+def _is_loopback(host: str) -> bool:
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
 def main() -> None:
     """Main entry point for the CLI."""
     parser = argparse.ArgumentParser(
@@ -16,6 +30,7 @@ def main() -> None:
 Examples:
   %(prog)s                    # Start server with stdio transport
   %(prog)s --port 8080        # Start server with HTTP transport on port 8080
+  %(prog)s --transport http --spawn-workers 4   # Coordinator with 4 local build workers
   %(prog)s --version          # Show version information
         """,
     )
@@ -51,6 +66,50 @@ Examples:
         type=Path,
         help="Path to log file (default: current directory/last_build.log)",
     )
+    parser.add_argument(
+        "--log-dir",
+        type=Path,
+        help="Directory for per-build compiler logs (default: build_logs next to the log file)",
+    )
+    parser.add_argument(
+        "--max-build-logs",
+        type=int,
+        help="Number of build logs to keep; older ones are deleted (default: 500)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        help="Maximum number of concurrent builds (default: CPU count; 8 per worker on a coordinator)",
+    )
+    parser.add_argument(
+        "--build-timeout",
+        type=float,
+        help="Kill builds running longer than this many seconds (default: no limit)",
+    )
+    parser.add_argument(
+        "--worker-root",
+        type=Path,
+        help="Run as a build worker for a coordinator, keeping synced sources here (HTTP only)",
+    )
+    parser.add_argument(
+        "--worker",
+        action="append",
+        default=[],
+        metavar="URL",
+        help="Dispatch builds to this worker server (repeatable); makes this server a coordinator",
+    )
+    parser.add_argument(
+        "--spawn-workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Start N local worker processes and dispatch builds to them",
+    )
+    parser.add_argument(
+        "--worker-token",
+        default=os.environ.get("DELPHI_MCP_WORKER_TOKEN"),
+        help="Shared secret between coordinator and workers (default: $DELPHI_MCP_WORKER_TOKEN)",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -58,12 +117,38 @@ Examples:
     )
 
     args = parser.parse_args()
+    if args.worker_root and args.transport != "http":
+        parser.error("--worker-root requires --transport http")
+    if args.worker_root and not args.worker_token and not _is_loopback(args.host):
+        # The worker API writes files and runs the compiler for whoever calls it
+        parser.error("--worker-root on a non-loopback --host requires --worker-token")
 
     try:
+        workers = list(args.worker)
+        token = args.worker_token
+        if args.spawn_workers:
+            token = token or secrets.token_hex(16)
+            extra = ["--build-timeout", str(args.build_timeout)] if args.build_timeout else []
+            if args.delphi_path:
+                extra += ["--delphi-path", str(args.delphi_path)]
+            workers += spawn_local_workers(
+                args.spawn_workers,
+                Path(tempfile.mkdtemp(prefix="delphi-mcp-workers-")),
+                token,
+                extra,
+            )
+
         server = DelphiMCPServer(
             delphi_path=args.delphi_path,
             log_file=args.log_file,
             debug=args.debug,
+            max_workers=args.max_workers,
+            build_timeout=args.build_timeout,
+            log_dir=args.log_dir,
+            max_build_logs=args.max_build_logs,
+            worker_root=args.worker_root,
+            workers=workers or None,
+            worker_token=token,
         )
         
         if args.transport == "stdio":
@@ -0,0 +1,197 @@
+"""Build timing, per-project history and Prometheus-style metrics."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+# Phases in the order they happen; compile is the process run minus parsing
+# (on a coordinator: the remote build, after syncing sources to the worker)
+PHASES = ("discovery", "queue", "sync", "toolchain", "cache_key", "spawn", "compile", "parse")
+
+
+class PhaseTimer:
+    """Wall-clock durations of the phases of one build."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.phases: dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def total(self) -> float:
+        return time.monotonic() - self.started
+
+    def format(self) -> str:
+        parts = [f"{p} {self.phases[p]:.2f}" for p in PHASES if p in self.phases]
+        return f"Timing (s): total {self.total():.2f}; " + ", ".join(parts)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class ProjectStats:
+    """Summary of the recent builds of one project/platform/config."""
+
+    builds: int
+    failures: int
+    p50: float
+    p95: float
+    last: float
+
+    @property
+    def error_rate(self) -> float:
+        return self.failures / self.builds if self.builds else 0.0
+
+
+class BuildHistory:
+    """Durations and outcomes of the last ``window`` compiler runs per project.
+
+    Cache hits are not recorded; they would hide the cost of real builds.
+    """
+
+    def __init__(self, window: int = 100, max_projects: int = 1000):
+        self.window = window
+        self.max_projects = max_projects
+        self._runs: OrderedDict[tuple[str, str, str], deque[tuple[float, bool]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, project: str, platform: str, config: str, seconds: float, ok: bool) -> None:
+        key = (project, platform, config)
+        with self._lock:
+            runs = self._runs.get(key)
+            if runs is None:
+                runs = self._runs[key] = deque(maxlen=self.window)
+                while len(self._runs) > self.max_projects:
+                    self._runs.popitem(last=False)
+            self._runs.move_to_end(key)
+            runs.append((seconds, ok))
+
+    def stats(self) -> dict[tuple[str, str, str], ProjectStats]:
+        with self._lock:
+            snapshot = {key: list(runs) for key, runs in self._runs.items()}
+        result = {}
+        for key, runs in snapshot.items():
+            durations = [d for d, _ in runs]
+            result[key] = ProjectStats(
+                builds=len(runs),
+                failures=sum(1 for _, ok in runs if not ok),
+                p50=_percentile(durations, 0.50),
+                p95=_percentile(durations, 0.95),
+                last=durations[-1],
+            )
+        return result
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ServerMetrics:
+    """Counters exposed in the Prometheus text format."""
+
+    def __init__(self, history: BuildHistory):
+        self.history = history
+        self.builds: dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.output_bytes = 0
+        self.output_lines = 0
+        self.phase_seconds: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def build_finished(self, result: str, timer: PhaseTimer, output_bytes: int, output_lines: int) -> None:
+        """Account for a finished build; result is ok, failed, stopped or cached."""
+        with self._lock:
+            self.builds[result] = self.builds.get(result, 0) + 1
+            if result == "cached":
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+            self.output_bytes += output_bytes
+            self.output_lines += output_lines
+            for phase, seconds in timer.phases.items():
+                self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    def count(self, result: str) -> None:
+        """Count a build that ended before it ran (e.g. timeout or error)."""
+        with self._lock:
+            self.builds[result] = self.builds.get(result, 0) + 1
+
+    def render(self, queued: int, active: int, workers: int) -> str:
+        with self._lock:
+            builds = dict(self.builds)
+            phases = dict(self.phase_seconds)
+            counters = (self.cache_hits, self.cache_misses, self.output_bytes, self.output_lines)
+        hits, misses, out_bytes, out_lines = counters
+        lines = [
+            "# HELP delphi_mcp_queue_depth Builds waiting for a worker or project lock.",
+            "# TYPE delphi_mcp_queue_depth gauge",
+            f"delphi_mcp_queue_depth {queued}",
+            "# HELP delphi_mcp_active_builds Builds currently running.",
+            "# TYPE delphi_mcp_active_builds gauge",
+            f"delphi_mcp_active_builds {active}",
+            "# HELP delphi_mcp_workers Size of the build worker pool.",
+            "# TYPE delphi_mcp_workers gauge",
+            f"delphi_mcp_workers {workers}",
+            "# HELP delphi_mcp_builds_total Finished build requests by result.",
+            "# TYPE delphi_mcp_builds_total counter",
+        ]
+        lines += [f'delphi_mcp_builds_total{{result="{r}"}} {n}' for r, n in sorted(builds.items())]
+        lines += [
+            "# HELP delphi_mcp_cache_hits_total Builds answered from the build cache.",
+            "# TYPE delphi_mcp_cache_hits_total counter",
+            f"delphi_mcp_cache_hits_total {hits}",
+            "# HELP delphi_mcp_cache_misses_total Builds that ran the compiler.",
+            "# TYPE delphi_mcp_cache_misses_total counter",
+            f"delphi_mcp_cache_misses_total {misses}",
+            "# HELP delphi_mcp_output_bytes_total Bytes of compiler output processed.",
+            "# TYPE delphi_mcp_output_bytes_total counter",
+            f"delphi_mcp_output_bytes_total {out_bytes}",
+            "# HELP delphi_mcp_output_lines_total Lines of compiler output processed.",
+            "# TYPE delphi_mcp_output_lines_total counter",
+            f"delphi_mcp_output_lines_total {out_lines}",
+            "# HELP delphi_mcp_phase_seconds_total Time spent per build phase.",
+            "# TYPE delphi_mcp_phase_seconds_total counter",
+        ]
+        lines += [
+            f'delphi_mcp_phase_seconds_total{{phase="{p}"}} {phases[p]:.6f}'
+            for p in PHASES if p in phases
+        ]
+        stats = self.history.stats()
+        lines += [
+            "# HELP delphi_mcp_build_duration_seconds Recent compile durations per project.",
+            "# TYPE delphi_mcp_build_duration_seconds summary",
+        ]
+        for (project, platform, config), s in stats.items():
+            labels = f'project="{_label(project)}",platform="{_label(platform)}",config="{_label(config)}"'
+            lines.append(f'delphi_mcp_build_duration_seconds{{{labels},quantile="0.5"}} {s.p50:.3f}')
+            lines.append(f'delphi_mcp_build_duration_seconds{{{labels},quantile="0.95"}} {s.p95:.3f}')
+            lines.append(f"delphi_mcp_build_duration_seconds_count{{{labels}}} {s.builds}")
+        lines += [
+            "# HELP delphi_mcp_build_error_rate Share of failed builds in the recent history.",
+            "# TYPE delphi_mcp_build_error_rate gauge",
+        ]
+        for (project, platform, config), s in stats.items():
+            labels = f'project="{_label(project)}",platform="{_label(platform)}",config="{_label(config)}"'
+            lines.append(f"delphi_mcp_build_error_rate{{{labels}}} {s.error_rate:.4f}")
+        return "\n".join(lines) + "\n"
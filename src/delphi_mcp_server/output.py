@@ -0,0 +1,85 @@
+"""Incremental processing of compiler output."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+from .diagnostics import Diagnostic, parse_line
+
+# "Unit1.pas(12)" progress lines from dcc, also the prefix of msbuild messages
+_UNIT_RE = re.compile(r"([^\s\\/()]+\.(?:pas|dpr|dpk|inc))\(\d+", re.IGNORECASE)
+
+
+@dataclass
+class BuildOutput:
+    """Running statistics of a compiler run.
+
+    ``stopped`` is set when the process was killed early (fail-fast).  Apart
+    from counters, at most ``max_kept`` unique diagnostics are retained, so
+    memory use does not depend on the amount of output.
+    """
+
+    max_kept: int = 10_000
+    lines: int = 0
+    bytes: int = 0
+    errors: int = 0
+    warnings: int = 0
+    hints: int = 0
+    current_unit: str | None = None
+    stopped: bool = False
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+    _seen: set = field(default_factory=set, repr=False)
+
+    def feed(self, line: str) -> Diagnostic | None:
+        """Account for one line (without trailing newline).
+
+        Returns:
+            The diagnostic on this line, or None if there is none or it
+            repeats an earlier one.
+        """
+        self.lines += 1
+        self.bytes += len(line) + 1
+        match = _UNIT_RE.search(line)
+        if match:
+            self.current_unit = match.group(1)
+        diag = parse_line(line)
+        if diag is None:
+            return None
+        key = diag.dedup_key()
+        if key in self._seen:
+            return None
+        if diag.severity == "error":
+            self.errors += 1
+        elif diag.severity == "warning":
+            self.warnings += 1
+        else:
+            self.hints += 1
+        if len(self.diagnostics) < self.max_kept:
+            self._seen.add(key)
+            self.diagnostics.append(diag)
+        return diag
+
+    def first_errors(self, count: int) -> list[Diagnostic]:
+        result = []
+        for d in self.diagnostics:
+            if d.severity == "error":
+                result.append(d)
+                if len(result) == count:
+                    break
+        return result
+
+    def progress_message(self) -> str:
+        unit = f"{self.current_unit}, " if self.current_unit else ""
+        return f"{unit}{self.lines} lines, {self.errors} errors, {self.warnings} warnings"
+
+
+@dataclass
+class BuildResult:
+    """Outcome of a build request as reported to the client."""
+
+    ok: bool
+    summary: str
+    build_id: str | None = None
+    # Build cache key of the compiled project; set once the compiler was resolved
+    cache_key: str | None = None
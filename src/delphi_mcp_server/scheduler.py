@@ -0,0 +1,127 @@
+"""Scheduling of concurrent builds."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+
+async def kill_process_tree(proc: asyncio.subprocess.Process) -> None:
+    """Kill a process together with its children (cmd -> msbuild -> dcc)."""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/F", "/T", "/PID", str(proc.pid),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            await killer.wait()
+        else:
+            # Processes are started in their own session, so the group id is the pid
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError) as e:
+        logging.debug("Process tree kill failed for %s: %s", proc.pid, e)
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+@dataclass
+class _Inflight:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class BuildScheduler:
+    """Run builds on a bounded pool with per-project locking.
+
+    * At most ``max_workers`` builds run at once (default: CPU count).
+    * Builds sharing a ``lock_key`` (project/platform/config) run one at a
+      time, so they never write to the same DCU output concurrently.
+    * Identical requests (same ``request_key``) submitted while one is in
+      flight wait for that run instead of starting another.
+    * Each build may have a timeout; on timeout or when every waiter is
+      cancelled, the build coroutine is cancelled, which is expected to kill
+      its processes (see ``kill_process_tree``).
+    """
+
+    def __init__(self, max_workers: int | None = None, timeout: float | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.queued = 0
+        self.active = 0
+        self._slots: asyncio.Semaphore | None = None
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._inflight: dict[Hashable, _Inflight] = {}
+
+    async def _run(
+        self,
+        lock_key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        timeout: float | None,
+    ) -> Any:
+        if self._slots is None:
+            # Created lazily so it binds to the running event loop
+            self._slots = asyncio.Semaphore(self.max_workers)
+        lock = self._locks.setdefault(lock_key, asyncio.Lock())
+        self.queued += 1
+        started = False
+        try:
+            # Take the project lock first so waiting builds do not hold a worker slot
+            async with lock:
+                async with self._slots:
+                    self.queued -= 1
+                    started = True
+                    self.active += 1
+                    try:
+                        if timeout:
+                            return await asyncio.wait_for(factory(), timeout)
+                        return await factory()
+                    finally:
+                        self.active -= 1
+        finally:
+            if not started:
+                self.queued -= 1
+
+    async def submit(
+        self,
+        request_key: Hashable,
+        lock_key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        timeout: float | None = None,
+    ) -> Any:
+        """Run ``factory()`` under the scheduler's limits and return its result.
+
+        Raises:
+            asyncio.TimeoutError: The build exceeded its timeout.
+        """
+        entry = self._inflight.get(request_key)
+        if entry is None:
+            task = asyncio.ensure_future(self._run(lock_key, factory, timeout or self.timeout))
+            entry = self._inflight[request_key] = _Inflight(task)
+
+            def _done(_: asyncio.Future, key: Hashable = request_key, e: _Inflight = entry) -> None:
+                if self._inflight.get(key) is e:
+                    del self._inflight[key]
+
+            task.add_done_callback(_done)
+        else:
+            logging.info("Joining in-flight build %s", request_key)
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            # Only stop the build when nobody is waiting for it any more
+            if entry.waiters == 1 and not entry.task.done():
+                entry.task.cancel()
+            raise
+        finally:
+            entry.waiters -= 1
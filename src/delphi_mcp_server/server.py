@@ -3,15 +3,46 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import json
 import os
 import subprocess
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable
 import datetime
 import logging
+import logging.handlers
+import re
 import xml.etree.ElementTree as ET
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from .buildlog import BuildLogStore, BuildLogWriter
+from .build_cache import BuildCache, collect_sources
+from .cluster import (
+    MissingBlobsError,
+    RemoteBuildError,
+    WorkerPool,
+    Workspace,
+    is_digest,
+    safe_relpath,
+    workspace_id,
+)
+from .diagnostics import SEVERITIES, Diagnostic, DiagnosticsStore
+from .discovery import ProjectIndex
+from .dproj import ProjectModelCache, ProjectSettings
+from .metrics import BuildHistory, PhaseTimer, ServerMetrics
+from .groupproj import GroupNode, find_cycle, parse_groupproj
+from .output import BuildOutput, BuildResult
+from .scheduler import BuildScheduler, kill_process_tree
+from .toolchain import Toolchain, ToolchainRegistry
+from .unitdeps import DependencyGraph, default_store_path, platform_defines
 
 
 class DelphiMCPServer:
@@ -21,7 +52,14 @@ class DelphiMCPServer:
         self, 
         delphi_path: Path | None = None,
         log_file: Path | None = None,
-        debug: bool = False
+        debug: bool = False,
+        max_workers: int | None = None,
+        build_timeout: float | None = None,
+        log_dir: Path | None = None,
+        max_build_logs: int | None = None,
+        worker_root: Path | None = None,
+        workers: list[str] | None = None,
+        worker_token: str | None = None,
     ):
         """Initialize the Delphi MCP Server.
         
@@ -29,24 +67,89 @@ class DelphiMCPServer:
             delphi_path: Path to Delphi installation (overrides DELPHI_PATH env var)
             log_file: Path to log file (default: current directory/last_build.log)
             debug: Enable debug logging
+            max_workers: Maximum number of concurrent builds (default: CPU count, 8 per worker on a coordinator)
+            build_timeout: Default build timeout in seconds (default: none)
+            log_dir: Directory for per-build compiler logs (default: build_logs next to log_file)
+            max_build_logs: Number of build logs to keep (default: 500)
+            worker_root: Serve builds for a coordinator, syncing sources below this directory
+            workers: Worker URLs; builds are dispatched to them instead of run locally
+            worker_token: Shared secret between coordinator and workers
         """
         self.mcp = FastMCP("delphi-compiler")
         
         # Setup logging
         self.log_file = log_file or Path.cwd() / "last_build.log"
         log_level = logging.DEBUG if debug else logging.INFO
+        # Server messages only; compiler output goes to the per-build logs
+        handler = logging.handlers.RotatingFileHandler(
+            self.log_file, maxBytes=10 * 1024 * 1024, backupCount=3, encoding="utf-8"
+        )
+        # force: the mcp package may already have configured the root logger
         logging.basicConfig(
-            filename=self.log_file, 
+            handlers=[handler],
             level=log_level, 
-            format="%(asctime)s %(levelname)s %(message)s"
+            format="%(asctime)s %(levelname)s %(message)s",
+            force=True,
+        )
+        # One compiler log per build id, rotated and compressed
+        self.build_logs = BuildLogStore(
+            log_dir or self.log_file.parent / "build_logs",
+            max_builds=max_build_logs or 500,
         )
         
         # Set Delphi path if provided
         if delphi_path:
             os.environ["DELPHI_PATH"] = str(delphi_path)
+
+        # Compiler/msbuild/rsvars locations, resolved once per environment
+        self.toolchains = ToolchainRegistry()
+        # Project indexes keyed by search root
+        self._project_indexes: dict[Path, ProjectIndex] = {}
+        # Parsed .dproj files, reloaded only when they change
+        self.projects = ProjectModelCache()
+        # Results of previous builds, keyed by a hash of their inputs
+        self.build_cache = BuildCache()
+        # Parsed compiler messages of recent builds
+        self.diagnostics = DiagnosticsStore()
+        # Worker pool, per-project locks and coalescing of identical requests.
+        # A coordinator only waits on its workers, which queue builds themselves,
+        # so its limit bounds dispatched requests rather than local CPU use
+        if workers and not max_workers:
+            max_workers = 8 * len(workers)
+        self.scheduler = BuildScheduler(max_workers=max_workers, timeout=build_timeout)
+        # Per-build phase timings, recent durations per project and counters
+        self.history = BuildHistory()
+        self.metrics = ServerMetrics(self.history)
+        # Unit dependency graph (uses/include/resource edges), persisted across runs
+        # (workers keep their own next to their workspaces)
+        self.unit_graph = DependencyGraph(
+            worker_root / "unit_graph.json" if worker_root else default_store_path()
+        )
+        atexit.register(self.unit_graph.save)
+        # Source (.pas) indexes keyed by search root, for resolving unit names
+        self._source_indexes: dict[Path, ProjectIndex] = {}
             
+        # Worker mode: sources synced from a coordinator, and the builds that
+        # left warm outputs behind (workspace/project/platform/config)
+        self.worker_token = worker_token
+        self.workspace = Workspace(worker_root) if worker_root else None
+        self._warm: OrderedDict[str, None] = OrderedDict()
+        # Stale workspaces and unused blobs are cleaned up after builds, hourly at most
+        self.prune_interval = 3600.0
+        self._last_prune = -self.prune_interval
+        self._prune_task: asyncio.Future | None = None
+        # Coordinator mode: builds go to the least-loaded healthy worker
+        self.pool = WorkerPool(workers, token=worker_token) if workers else None
+        if self.pool is not None:
+            # httpx logs every request to the workers at INFO level
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+        self._remote_builds: OrderedDict[str, str] = OrderedDict()  # build id -> worker URL
+
         # Register tools
         self._register_tools()
+        self._register_routes()
+        if self.workspace is not None:
+            self._register_worker_routes()
     
     def _register_tools(self) -> None:
         """Register MCP tools."""
@@ -54,191 +157,1262 @@ class DelphiMCPServer:
         @self.mcp.tool()
         async def compile(
             project: str | None = None,
+            platform: str = "Win32",
+            delphi_version: str | None = None,
+            force: bool = False,
+            max_errors: int = 0,
+            timeout: float = 0,
+            ctx: Context | None = None,
         ) -> str:
             """Compile Delphi project (.dpr or .dproj) in Debug configuration.
 
             Args:
                 project: Path to project file. If omitted, searches current directory.
+                platform: Target platform (Win32, Win64). Defaults to Win32.
+                delphi_version: Installed Delphi version (e.g. "23.0") or installation
+                    path. Defaults to DELPHI_PATH.
+                force: Run the compiler even if nothing changed since the last build.
+                max_errors: Stop the compiler after this many errors (0 = never).
+                timeout: Kill the build after this many seconds (0 = server default).
 
             Returns:
                 Compilation result with error/warning summary.
             """
-            return await self._compile_project(project, debug_build=True)
+            result = await self._compile_project(
+                project,
+                config="Debug",
+                platform=platform,
+                delphi_version=delphi_version,
+                force=force,
+                max_errors=max_errors,
+                timeout=timeout,
+                progress=self._progress_reporter(ctx),
+            )
+            return result.summary
 
         @self.mcp.tool()
         async def build(
             project: str | None = None,
+            platform: str = "Win32",
+            delphi_version: str | None = None,
+            force: bool = False,
+            max_errors: int = 0,
+            timeout: float = 0,
+            ctx: Context | None = None,
         ) -> str:
             """Build project in Release configuration (alias for compile with Release config).
 
             Args:
                 project: Path to project file. If omitted, searches current directory.
+                platform: Target platform (Win32, Win64). Defaults to Win32.
+                delphi_version: Installed Delphi version (e.g. "23.0") or installation
+                    path. Defaults to DELPHI_PATH.
+                force: Run the compiler even if nothing changed since the last build.
+                max_errors: Stop the compiler after this many errors (0 = never).
+                timeout: Kill the build after this many seconds (0 = server default).
 
             Returns:
                 Build result with error/warning summary.
             """
-            # Pass only Release config; platform resolved automatically
-            return await self._compile_project(project, debug_build=False)
+            result = await self._compile_project(
+                project,
+                config="Release",
+                platform=platform,
+                delphi_version=delphi_version,
+                force=force,
+                max_errors=max_errors,
+                timeout=timeout,
+                progress=self._progress_reporter(ctx),
+            )
+            return result.summary
+
+        @self.mcp.tool()
+        async def build_group(
+            group: str | None = None,
+            platforms: list[str] | None = None,
+            configs: list[str] | None = None,
+            delphi_version: str | None = None,
+            force: bool = False,
+            timeout: float = 0,
+            ctx: Context | None = None,
+        ) -> str:
+            """Build all projects of a RAD Studio project group (.groupproj).
+
+            Projects are built in dependency order (Dependencies metadata and package
+            requires clauses); independent projects build in parallel.
+
+            Args:
+                group: Path to .groupproj file. If omitted, uses the first one in the
+                    current directory.
+                platforms: Target platforms. Defaults to ["Win32"].
+                configs: Build configurations. Defaults to ["Release"].
+                delphi_version: Installed Delphi version (e.g. "23.0") or installation
+                    path. Defaults to DELPHI_PATH.
+                force: Run the compiler even if nothing changed since the last build.
+                timeout: Kill each project build after this many seconds (0 = server default).
+
+            Returns:
+                Per-project results for every platform/config combination.
+            """
+            return await self._build_group(
+                group,
+                platforms or ["Win32"],
+                configs or ["Release"],
+                delphi_version=delphi_version,
+                force=force,
+                timeout=timeout,
+                ctx=ctx,
+            )
+
+        @self.mcp.tool()
+        async def list_projects(
+            root: str | None = None,
+        ) -> str:
+            """List Delphi projects (.dproj/.dpr) found below a directory.
+
+            Args:
+                root: Directory to search. Defaults to current directory.
+
+            Returns:
+                Projects in preference order; the first one is used when compile/build
+                is called without a project.
+            """
+            root_path = Path(root) if root else Path.cwd()
+            if not root_path.is_dir():
+                return f"ERROR: Directory not found: {root}"
+            projects = self.list_root_projects(root_path)
+            if not projects:
+                return f"No Delphi projects found in {root_path}"
+            # The index reports paths below the resolved root
+            lines = [str(p.relative_to(root_path.resolve())) for p in projects]
+            return f"Projects in {root_path} ({len(lines)}):\n" + "\n".join(lines)
+
+        @self.mcp.tool()
+        async def get_diagnostics(
+            build_id: str | None = None,
+            severity: str | None = None,
+            file: str | None = None,
+            code: str | None = None,
+            offset: int = 0,
+            limit: int = 20,
+        ) -> str:
+            """Page through errors, warnings and hints of a build.
+
+            Args:
+                build_id: Build id from a compile/build result. Defaults to the latest build.
+                severity: Only return "error", "warning" or "hint" messages.
+                file: Only return messages whose file path contains this text.
+                code: Only return messages with this code (e.g. E2003).
+                offset: Index of the first message to return.
+                limit: Maximum number of messages to return.
+
+            Returns:
+                Matching diagnostics, one per line.
+            """
+            return self._query_diagnostics(build_id, severity, file, code, offset, limit)
+
+        @self.mcp.tool()
+        async def affected_projects(
+            changed_files: list[str],
+            root: str | None = None,
+            platform: str = "Win32",
+            config: str = "Debug",
+        ) -> str:
+            """List the projects that need rebuilding after files have changed.
+
+            Follows uses clauses, include files and resources from each project's
+            main source, so a change to a shared unit reports every project using it.
+
+            Args:
+                changed_files: Changed source files (absolute or relative to root).
+                root: Directory to search for projects. Defaults to current directory.
+                platform: Platform whose conditional defines apply (Win32 or Win64).
+                config: Configuration whose defines and search path apply.
+
+            Returns:
+                Affected projects, one per line.
+            """
+            root_path = Path(root) if root else Path.cwd()
+            if not root_path.is_dir():
+                return f"ERROR: Directory not found: {root}"
+            loop = asyncio.get_running_loop()
+            affected = await loop.run_in_executor(
+                None, self.affected_projects, root_path, changed_files, platform, config
+            )
+            if not affected:
+                return f"No projects in {root_path} depend on the changed files"
+            lines = [str(p.relative_to(root_path.resolve())) for p in affected]
+            return f"Affected projects ({len(lines)}):\n" + "\n".join(lines)
+
+        @self.mcp.tool()
+        async def get_build_log(
+            build_id: str | None = None,
+            offset: int = 0,
+            length: int = 16384,
+            tail: int = 0,
+            grep: str | None = None,
+            max_matches: int = 100,
+        ) -> str:
+            """Read part of the compiler log of a build.
+
+            By default returns a byte range; set tail to get the last lines instead,
+            or grep to get matching lines with their line numbers.
+
+            Args:
+                build_id: Build id from a compile/build result. Defaults to the latest build.
+                offset: Byte offset to start reading at.
+                length: Number of bytes to return (at most 1 MiB).
+                tail: Return this many lines from the end of the log.
+                grep: Regular expression; return the matching lines.
+                max_matches: Maximum number of matching lines to return for grep.
+
+            Returns:
+                The requested part of the log.
+            """
+            if self.pool is not None:
+                build_id = build_id or self.diagnostics.latest_build()
+                url = self._remote_builds.get(build_id) if build_id else None
+                if url:
+                    params = {"build_id": build_id, "offset": offset, "length": length,
+                              "tail": tail, "max_matches": max_matches}
+                    if grep:
+                        params["grep"] = grep
+                    return await self.pool.fetch_log(url, params)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._read_build_log, build_id, offset, length, tail, grep, max_matches
+            )
+
+        @self.mcp.tool()
+        async def build_stats(project: str | None = None) -> str:
+            """Show recent build durations and error rates per project.
+
+            Args:
+                project: Only show projects whose path contains this text.
+
+            Returns:
+                One line per project/platform/config with the number of recent
+                builds, median and 95th percentile duration and error rate.
+            """
+            return self._format_build_stats(project)
+
+    def _format_build_stats(self, project: str | None) -> str:
+        """Format the rolling build history."""
+        stats = self.history.stats()
+        rows = [
+            (key, s) for key, s in stats.items()
+            if not project or project.lower() in key[0].lower()
+        ]
+        if not rows:
+            return "No builds recorded yet"
+        lines = [
+            f"{path} {platform}/{config}: {s.builds} builds, p50 {s.p50:.1f} s, "
+            f"p95 {s.p95:.1f} s, last {s.last:.1f} s, error rate {s.error_rate:.0%}"
+            for (path, platform, config), s in sorted(rows, key=lambda r: r[0])
+        ]
+        return f"Build history ({len(lines)}):\n" + "\n".join(lines)
+
+    def _register_routes(self) -> None:
+        """Register HTTP endpoints served next to the MCP endpoint by run_http."""
+
+        @self.mcp.custom_route("/metrics", methods=["GET"])
+        async def metrics(request: Request) -> Response:
+            text = self.metrics.render(
+                self.scheduler.queued, self.scheduler.active, self.scheduler.max_workers
+            )
+            return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+    def _register_worker_routes(self) -> None:
+        """Register the HTTP API a coordinator uses to run builds on this server."""
+        assert self.workspace is not None
+        workspace = self.workspace
+
+        def denied(request: Request) -> Response | None:
+            if self.worker_token and request.headers.get("authorization") != f"Bearer {self.worker_token}":
+                return PlainTextResponse("unauthorized", status_code=401)
+            return None
+
+        @self.mcp.custom_route("/worker/status", methods=["GET"])
+        async def worker_status(request: Request) -> Response:
+            return denied(request) or JSONResponse({
+                "queued": self.scheduler.queued,
+                "active": self.scheduler.active,
+                "max_workers": self.scheduler.max_workers,
+                "warm": list(self._warm),
+            })
+
+        @self.mcp.custom_route("/worker/missing", methods=["POST"])
+        async def worker_missing(request: Request) -> Response:
+            if (refused := denied(request)) is not None:
+                return refused
+            body = await request.json()
+            digests = body.get("digests")
+            if not isinstance(digests, list):
+                return PlainTextResponse("invalid digest list", status_code=400)
+            loop = asyncio.get_running_loop()
+            try:
+                missing = await loop.run_in_executor(None, workspace.missing, set(digests))
+            except (ValueError, TypeError) as e:
+                return PlainTextResponse(str(e), status_code=400)
+            return JSONResponse({"missing": missing})
+
+        @self.mcp.custom_route("/worker/blob/{digest}", methods=["PUT"])
+        async def worker_blob(request: Request) -> Response:
+            if (refused := denied(request)) is not None:
+                return refused
+            digest = request.path_params["digest"]
+            if not is_digest(digest):
+                return PlainTextResponse("invalid digest", status_code=400)
+            data = await request.body()
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, workspace.put_blob, digest, data):
+                return PlainTextResponse("digest mismatch", status_code=400)
+            return Response(status_code=204)
+
+        @self.mcp.custom_route("/worker/log", methods=["GET"])
+        async def worker_log(request: Request) -> Response:
+            if (refused := denied(request)) is not None:
+                return refused
+            q = request.query_params
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(
+                None, self._read_build_log, q.get("build_id"), int(q.get("offset", 0)),
+                int(q.get("length", 16384)), int(q.get("tail", 0)), q.get("grep"),
+                int(q.get("max_matches", 100)),
+            )
+            return PlainTextResponse(text)
+
+        @self.mcp.custom_route("/worker/build", methods=["POST"])
+        async def worker_build(request: Request) -> Response:
+            if (refused := denied(request)) is not None:
+                return refused
+            body = await request.json()
+            ws_id = str(body.get("workspace", ""))
+            project = safe_relpath(str(body.get("project", "")))
+            manifest = body.get("manifest") or {}
+            if not ws_id.isalnum() or project is None or not isinstance(manifest, dict):
+                return PlainTextResponse("invalid build request", status_code=400)
+            loop = asyncio.get_running_loop()
+            try:
+                missing = await loop.run_in_executor(None, workspace.missing, set(manifest.values()))
+            except (ValueError, TypeError) as e:
+                return PlainTextResponse(str(e), status_code=400)
+            if missing:
+                # Pruned since the coordinator last synced; it uploads them and retries
+                return JSONResponse({"missing": missing}, status_code=409)
+            platform = body.get("platform", "Win32")
+            config = body.get("config", "Debug")
+            dependency_keys = [str(k) for k in body.get("dependency_keys") or []]
+            events: asyncio.Queue[dict] = asyncio.Queue()
+
+            async def report(stats: BuildOutput) -> None:
+                events.put_nowait({
+                    "event": "progress",
+                    "lines": stats.lines,
+                    "bytes": stats.bytes,
+                    "errors": stats.errors,
+                    "warnings": stats.warnings,
+                    "unit": stats.current_unit,
+                })
+
+            async def run() -> dict:
+                loop = asyncio.get_running_loop()
+                # Only materialising is serialised; builds in one workspace run in
+                # parallel, and files other projects dropped stay until all are done
+                async with workspace.lock(ws_id):
+                    try:
+                        base = await loop.run_in_executor(
+                            None, workspace.materialize, ws_id, project.as_posix(), manifest
+                        )
+                    except (OSError, ValueError) as e:
+                        return {"event": "result", "ok": False, "summary": f"ERROR: Sync failed: {e}"}
+                    workspace.enter(ws_id)
+                try:
+                    result = await self._compile_project(
+                        str(base / project),
+                        config=config,
+                        platform=platform,
+                        delphi_version=body.get("delphi_version"),
+                        force=bool(body.get("force")),
+                        max_errors=int(body.get("max_errors") or 0),
+                        timeout=float(body.get("timeout") or 0),
+                        progress=report,
+                        dependency_keys=dependency_keys,
+                    )
+                finally:
+                    async with workspace.lock(ws_id):
+                        await loop.run_in_executor(None, workspace.leave, ws_id)
+                records = self.diagnostics.query(result.build_id, None, None, None) if result.build_id else None
+                if result.ok:
+                    key = f"{ws_id}/{project.as_posix()}/{platform}/{config}"
+                    self._warm[key] = None
+                    self._warm.move_to_end(key)
+                    while len(self._warm) > 1000:
+                        self._warm.popitem(last=False)
+                self._schedule_prune()
+                return {
+                    "event": "result",
+                    "ok": result.ok,
+                    "summary": result.summary,
+                    "build_id": result.build_id,
+                    "cache_key": result.cache_key,
+                    "workspace": str(base),
+                    "diagnostics": [asdict(d) for d in records or []],
+                }
+
+            async def stream():
+                task = asyncio.ensure_future(run())
+                try:
+                    while True:
+                        getter = asyncio.ensure_future(events.get())
+                        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                        if getter.done():
+                            yield json.dumps(getter.result()) + "\n"
+                            continue
+                        getter.cancel()
+                        yield json.dumps(task.result()) + "\n"
+                        return
+                finally:
+                    # The coordinator went away: stop the build (kills the compiler)
+                    if not task.done():
+                        task.cancel()
+
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    def _schedule_prune(self) -> None:
+        """Start a workspace/blob cleanup if the last one is ``prune_interval`` old."""
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        task = asyncio.ensure_future(self._prune_workspace())
+        self._prune_task = task
+
+    async def _prune_workspace(self) -> None:
+        """Remove stale worker workspaces and the blobs only they used."""
+        assert self.workspace is not None
+        workspace = self.workspace
+        loop = asyncio.get_running_loop()
+        try:
+            for ws_id in await loop.run_in_executor(None, workspace.stale):
+                async with workspace.lock(ws_id):
+                    await loop.run_in_executor(None, workspace.remove, ws_id)
+                for key in [k for k in self._warm if k.startswith(ws_id + "/")]:
+                    del self._warm[key]
+            freed = await loop.run_in_executor(None, workspace.prune_blobs)
+            if freed:
+                logging.info("Pruned %d bytes of unused blobs", freed)
+        except OSError as e:
+            logging.warning("Workspace cleanup failed: %s", e)
+
+    def _read_build_log(
+        self,
+        build_id: str | None,
+        offset: int,
+        length: int,
+        tail: int,
+        grep: str | None,
+        max_matches: int,
+    ) -> str:
+        """Format a range, the tail or the matches of a stored build log."""
+        build_id = build_id or self.build_logs.latest()
+        if not build_id:
+            return "ERROR: No build logs recorded yet"
+        size = self.build_logs.size(build_id)
+        if size is None:
+            return f"ERROR: Unknown or expired build id: {build_id}"
+        if grep:
+            try:
+                pattern = re.compile(grep, re.IGNORECASE)
+            except re.error as e:
+                return f"ERROR: Invalid pattern {grep!r}: {e}"
+            found = self.build_logs.grep(build_id, pattern, max(max_matches, 0))
+            if found is None:
+                return f"ERROR: Unknown or expired build id: {build_id}"
+            matches, total = found
+            header = f"Build {build_id} log: {total} matching lines"
+            if total > len(matches):
+                header += f" (first {len(matches)} shown)"
+            return header + "\n" + "\n".join(f"{n}: {line}" for n, line in matches)
+        if tail > 0:
+            lines = self.build_logs.tail(build_id, tail)
+            if lines is None:
+                return f"ERROR: Unknown or expired build id: {build_id}"
+            return f"Build {build_id} log: last {len(lines)} lines of {size} bytes\n" + "\n".join(lines)
+        length = min(max(length, 0), 1024 * 1024)
+        data = self.build_logs.read(build_id, offset, length)
+        if data is None:
+            return f"ERROR: Unknown or expired build id: {build_id}"
+        start = min(max(offset, 0), size)
+        header = f"Build {build_id} log: bytes {start}-{start + len(data)} of {size}"
+        return header + "\n" + data.decode("utf-8", errors="replace")
+
+    def _query_diagnostics(
+        self,
+        build_id: str | None,
+        severity: str | None,
+        file: str | None,
+        code: str | None,
+        offset: int,
+        limit: int,
+    ) -> str:
+        """Format a page of stored diagnostics."""
+        if severity and severity.lower() not in SEVERITIES:
+            return f"ERROR: Unknown severity: {severity} (expected one of {', '.join(SEVERITIES)})"
+        build_id = build_id or self.diagnostics.latest_build()
+        if not build_id:
+            return "ERROR: No builds recorded yet"
+        records = self.diagnostics.query(build_id, severity, file, code)
+        if records is None:
+            return f"ERROR: Unknown or expired build id: {build_id}"
+        offset = max(offset, 0)
+        page = records[offset:offset + max(limit, 0)]
+        if not page:
+            return f"Build {build_id}: no diagnostics in range ({len(records)} matching)"
+        header = f"Build {build_id}: diagnostics {offset + 1}-{offset + len(page)} of {len(records)}"
+        return header + "\n" + "\n".join(d.format() for d in page)
 
-    def find_delphi_compiler(self, platform: str) -> str | None:
+    def find_delphi_compiler(
+        self, platform: str, delphi_version: str | None = None
+    ) -> str | None:
         """Find Delphi compiler executable for the specified platform."""
-        exe = "dcc32.exe" if platform.lower() == "win32" else "dcc64.exe"
-        root = os.environ.get("DELPHI_PATH")
-        if root:
-            root_path = Path(root)
-            # If pointing directly to bin directory
-            candidates = [root_path, root_path / "bin"] if root_path.name.lower() != "bin" else [root_path]
-            for base in candidates:
-                cand = base / exe
-                if cand.exists():
-                    return str(cand)
-        # Fallback to PATH
-        for p in os.environ.get("PATH", "").split(os.pathsep):
-            cand = Path(p) / exe
-            if cand.exists():
-                return str(cand)
-        return None
-
-    def find_msbuild(self) -> str | None:
-        """Locate MSBuild.exe next to dcc32.exe/dcc64.exe or in PATH."""
-        # Try RAD Studio bin
-        for plat in ("Win32", "Win64"):
-            comp = self.find_delphi_compiler(plat)
-            if comp:
-                cand = Path(comp).with_name("msbuild.exe")
-                if cand.exists():
-                    return str(cand)
-        # Fallback PATH
-        for p in os.environ.get("PATH", "").split(os.pathsep):
-            cand = Path(p) / "msbuild.exe"
-            if cand.exists():
-                return str(cand)
-        return None
-
-    def find_rsvars(self) -> str | None:
+        toolchain = self.toolchains.resolve(delphi_version)
+        return toolchain.compiler(platform) if toolchain else None
+
+    def find_msbuild(self, delphi_version: str | None = None) -> str | None:
+        """Locate MSBuild.exe next to dcc32.exe/dcc64.exe, in PATH or via rsvars."""
+        toolchain = self.toolchains.resolve(delphi_version)
+        return self.toolchains.msbuild_for(toolchain) if toolchain else None
+
+    def find_rsvars(self, delphi_version: str | None = None) -> str | None:
         """Locate rsvars.bat using DELPHI_PATH or compiler location."""
-        # First, DELPHI_PATH
-        root = os.environ.get("DELPHI_PATH")
-        if root:
-            cand = Path(root) / "bin" / "rsvars.bat"
-            if cand.exists():
-                return str(cand)
-        # Next, same dir where dcc32 was found
-        comp = self.find_delphi_compiler("Win32") or self.find_delphi_compiler("Win64")
-        if comp:
-            cand = Path(comp).with_name("rsvars.bat")
-            if cand.exists():
-                return str(cand)
-        return None
+        toolchain = self.toolchains.resolve(delphi_version)
+        return toolchain.rsvars if toolchain else None
+
+    def project_index(self, root: Path) -> ProjectIndex:
+        """Return the (cached) project index for a directory."""
+        root = root.resolve()
+        index = self._project_indexes.get(root)
+        if index is None:
+            index = self._project_indexes[root] = ProjectIndex(root)
+        return index
+
+    def list_root_projects(self, root: Path) -> list[Path]:
+        """Return the projects below a directory, in preference order.
+
+        A .dpr that is the main source of a listed .dproj is not reported as
+        a separate project.
+        """
+        projects = self.project_index(root).refresh()
+        main_sources = set()
+        for p in projects:
+            settings = self.project_settings(p, "Win32", "Debug")
+            if settings and settings.main_source:
+                main_sources.add(os.path.normcase(os.path.abspath(settings.main_source)))
+        return [p for p in projects if os.path.normcase(os.path.abspath(p)) not in main_sources]
+
+    def unit_index(self, root: Path) -> dict[str, list[str]]:
+        """Map unit names (lower case) to the .pas files below a directory."""
+        root = root.resolve()
+        index = self._source_indexes.get(root)
+        if index is None:
+            index = self._source_indexes[root] = ProjectIndex(root, extensions=(".pas",))
+        units: dict[str, list[str]] = {}
+        for path in index.refresh():
+            units.setdefault(path.stem.lower(), []).append(str(path))
+        return units
+
+    def project_closure(
+        self,
+        proj_path: Path,
+        platform: str,
+        config: str,
+        unit_index: dict[str, list[str]] | None = None,
+    ) -> set[str] | None:
+        """Return the files a project's build reads, following uses clauses.
+
+        Returns:
+            Normalised paths, or None if the main source cannot be found.
+        """
+        settings = self.project_settings(proj_path, platform, config)
+        if settings is not None:
+            main = settings.main_source
+            defines = set(settings.defines)
+            search_dirs = [
+                proj_path.parent / p.replace("\\", "/") for p in settings.search_paths
+            ]
+        else:
+            main = proj_path if proj_path.suffix.lower() in (".dpr", ".dpk") else None
+            defines = {config.upper()}
+            search_dirs = []
+        if main is None or not main.is_file():
+            return None
+        defines.update(platform_defines(platform))
+        if unit_index is None:
+            unit_index = self.unit_index(proj_path.parent)
+        files = self.unit_graph.closure(main, defines, search_dirs, unit_index)
+        files.add(os.path.normcase(os.path.abspath(proj_path)))
+        return files
+
+    def affected_projects(
+        self, root: Path, changed_files: list[str], platform: str, config: str
+    ) -> list[Path]:
+        """Return the projects below root whose closure contains a changed file."""
+        root = root.resolve()
+        changed = {
+            os.path.normcase(os.path.abspath(root / f.replace("\\", "/")))
+            for f in changed_files
+        }
+        units = self.unit_index(root)
+        affected = []
+        for proj in self.list_root_projects(root):
+            closure = self.project_closure(proj, platform, config, units)
+            if closure is None:
+                # Without a readable main source, fall back to the project folder
+                folder = os.path.normcase(str(proj.parent)) + os.sep
+                if any(c.startswith(folder) for c in changed):
+                    affected.append(proj)
+            elif closure & changed:
+                affected.append(proj)
+        return affected
 
     def discover_project(self) -> Path | None:
-        """Find first .dproj or .dpr file in current directory."""
-        for ext in ("*.dproj", "*.dpr"):
-            matches = list(Path.cwd().rglob(ext))
-            if matches:
-                return matches[0]
-        return None
-
-    async def run_subprocess(self, cmd: list[str]) -> tuple[int, str]:
-        """Run subprocess and return exit code and output."""
+        """Find the preferred .dproj or .dpr file in current directory.
+
+        .dproj files win over .dpr files, then the shallowest project, then the
+        alphabetically first relative path. Ignored directories (.git, __history,
+        output folders, entries from .gitignore/.delphimcpignore) are skipped.
+        """
+        return self.project_index(Path.cwd()).best()
+
+    def _progress_reporter(
+        self, ctx: Context | None
+    ) -> Callable[[BuildOutput], Awaitable[None]] | None:
+        """Return a callback sending build progress as MCP notifications."""
+        if ctx is None:
+            return None
+
+        async def report(stats: BuildOutput) -> None:
+            await ctx.report_progress(stats.lines, message=stats.progress_message())
+
+        return report
+
+    async def run_subprocess(
+        self,
+        cmd: list[str],
+        env: dict[str, str] | None = None,
+        *,
+        progress: Callable[[BuildOutput], Awaitable[None]] | None = None,
+        max_errors: int = 0,
+        progress_interval: float = 0.5,
+        log: BuildLogWriter | None = None,
+        timer: PhaseTimer | None = None,
+    ) -> tuple[int, BuildOutput]:
+        """Run subprocess, streaming its output line by line.
+
+        Lines are logged and classified as they arrive; only running
+        statistics are kept in memory. If the calling task is cancelled or
+        anything else ends the read loop early, the whole process tree is killed.
+
+        Args:
+            cmd: Command line to execute.
+            env: Environment for the process (default: inherit).
+            progress: Called with the current statistics at most every
+                ``progress_interval`` seconds and once at the end.
+            max_errors: Kill the process after this many errors (0 = never).
+            progress_interval: Minimum delay between progress callbacks.
+            log: Build log receiving every output line (default: debug logging).
+            timer: Receives the spawn, compile and parse phase durations.
+
+        Returns:
+            Exit code and output statistics.
+        """
+        timer = timer or PhaseTimer()
+        spawn_started = time.monotonic()
         proc = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
+            env=env,
+            # Own process group on POSIX so the whole tree can be killed
+            start_new_session=os.name != "nt",
         )
-        stdout_bytes, _ = await proc.communicate()
-        output = stdout_bytes.decode('utf-8', errors='ignore')
-        return proc.returncode, output
+        assert proc.stdout is not None
+        run_started = time.monotonic()
+        timer.add("spawn", run_started - spawn_started)
+        stats = BuildOutput()
+        last_report = run_started
+        parse_time = 0.0
+        try:
+            while True:
+                try:
+                    raw = await proc.stdout.readline()
+                except ValueError:
+                    # Line longer than the stream limit; the reader already dropped it
+                    stats.feed("<line truncated>")
+                    continue
+                if not raw:
+                    break
+                line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+                if log:
+                    log.write(line)
+                else:
+                    logging.debug(line)
+                parse_started = time.monotonic()
+                stats.feed(line)
+                parse_time += time.monotonic() - parse_started
+                if max_errors and stats.errors >= max_errors and not stats.stopped:
+                    stats.stopped = True
+                    await kill_process_tree(proc)
+                if progress and time.monotonic() - last_report >= progress_interval:
+                    last_report = time.monotonic()
+                    await progress(stats)
+            await proc.wait()
+        except asyncio.CancelledError:
+            logging.info("Build cancelled, killing process %s", proc.pid)
+            raise
+        finally:
+            # Any early exit (cancellation, failing progress callback or log
+            # write) must not leave the compiler running
+            if proc.returncode is None:
+                await kill_process_tree(proc)
+            timer.add("parse", parse_time)
+            timer.add("compile", time.monotonic() - run_started - parse_time)
+        if progress:
+            await progress(stats)
+        return proc.returncode, stats
+
+    def project_settings(
+        self, proj_path: Path, platform: str, config: str
+    ) -> ProjectSettings | None:
+        """Return evaluated .dproj settings, or None for other or unreadable files."""
+        if proj_path.suffix.lower() != ".dproj":
+            return None
+        try:
+            return self.projects.settings(proj_path, platform, config)
+        except (OSError, ET.ParseError) as e:
+            logging.warning("Cannot read %s: %s", proj_path, e)
+            return None
 
     def extract_output_dirs(self, dproj_path: Path, platform: str, config: str) -> tuple[str | None, str | None]:
-        """Parse .dproj and return (exe_output, dcu_output) for given platform and config."""
-        tree = ET.parse(dproj_path)
-        root = tree.getroot()
-        ns = {'msb': 'http://schemas.microsoft.com/developer/msbuild/2003'}
-        exe_output = None
-        dcu_output = None
-        # Search PropertyGroup with matching conditions
-        for pg in root.findall('msb:PropertyGroup', ns):
-            cond = pg.attrib.get('Condition', '')
-            if platform.lower() in cond.lower() and config.lower() in cond.lower():
-                eo = pg.find('msb:DCC_ExeOutput', ns)
-                du = pg.find('msb:DCC_DcuOutput', ns)
-                if eo is not None and eo.text:
-                    exe_output = eo.text
-                if du is not None and du.text:
-                    dcu_output = du.text
-        # Fallback: search without platform/config conditions
-        if not exe_output or not dcu_output:
-            for pg in root.findall('msb:PropertyGroup', ns):
-                eo = pg.find('msb:DCC_ExeOutput', ns)
-                du = pg.find('msb:DCC_DcuOutput', ns)
-                if not exe_output and eo is not None and eo.text:
-                    exe_output = eo.text
-                if not dcu_output and du is not None and du.text:
-                    dcu_output = du.text
-        return exe_output, dcu_output
+        """Return (exe_output, dcu_output) of a .dproj for given platform and config.
+
+        Values are taken from the cached project model, which follows the
+        Base/Cfg_N/Cfg_N_Platform inheritance chain and expands $(...) references.
+        """
+        settings = self.projects.settings(dproj_path, platform, config)
+        return settings.get("DCC_ExeOutput"), settings.get("DCC_DcuOutput")
+
+    def expected_outputs(self, proj_path: Path, platform: str, config: str) -> list[Path]:
+        """Return the binaries a project may produce (.exe, .dll or .bpl)."""
+        settings = self.project_settings(proj_path, platform, config)
+        if settings is None:
+            out_dir = proj_path.parent
+            return [out_dir / (proj_path.stem + ext) for ext in (".exe", ".dll", ".bpl")]
+        main = settings.main_source
+        stem = main.stem if main else proj_path.stem
+        if main and main.suffix.lower() == ".dpk":
+            out_dir = settings.bpl_output or proj_path.parent
+            suffix = settings.get("DllSuffix") or ""
+            return [out_dir / f"{stem}{suffix}.bpl"]
+        out_dir = settings.exe_output or proj_path.parent
+        return [out_dir / (stem + ext) for ext in (".exe", ".dll")]
+
+    def build_key(
+        self,
+        proj_path: Path,
+        defines: list[str],
+        platform: str,
+        config: str,
+        toolchain: Toolchain,
+        dependency_keys: list[str] | None = None,
+    ) -> str:
+        """Hash everything that determines the result of a build.
+
+        Sources are the files reachable from the main source through uses
+        clauses, includes and resources, plus the project's option sets; edits
+        to unrelated files in the same folder do not invalidate the cache.  If
+        the main source cannot be scanned, every source below the project
+        folder is hashed instead.  ``dependency_keys`` are the build keys of
+        projects this one links against (packages in a group), so it is
+        rebuilt when one of them changes.
+        """
+        closure = self.project_closure(proj_path, platform, config)
+        if closure is None:
+            sources = collect_sources(proj_path.parent)
+        else:
+            sources = sorted(closure)
+            sources.extend(str(p) for p in proj_path.parent.glob("*.optset"))
+        settings = self.project_settings(proj_path, platform, config)
+        if settings is not None:
+            # Units referenced from outside the project folder, and the effective
+            # defines/search path (which may come from option sets)
+            sources.extend(str(u) for u in settings.units)
+            defines = defines + settings.defines + [f"path:{p}" for p in settings.search_paths]
+        if dependency_keys:
+            defines = defines + [f"dep:{k}" for k in dependency_keys]
+        return self.build_cache.compute_key(
+            proj_path, sources, defines, platform, config, toolchain.identity
+        )
 
     async def _compile_project(
         self,
         project: str | None = None,
         *,
-        debug_build: bool = True,
-    ) -> str:
+        config: str = "Debug",
+        platform: str = "Win32",
+        delphi_version: str | None = None,
+        force: bool = False,
+        max_errors: int = 0,
+        timeout: float = 0,
+        progress: Callable[[BuildOutput], Awaitable[None]] | None = None,
+        dependency_keys: list[str] | None = None,
+    ) -> BuildResult:
         """Internal method to compile Delphi project."""
+        timer = PhaseTimer()
         # Auto-discover project if not provided
         if not project:
-            discovered = self.discover_project()
+            with timer.phase("discovery"):
+                discovered = self.discover_project()
             if not discovered:
-                return "ERROR: No Delphi project (.dpr/.dproj) found in current directory"
+                return BuildResult(False, "ERROR: No Delphi project (.dpr/.dproj) found in current directory")
             project = str(discovered)
             
         proj_path = Path(project)
         if not proj_path.exists():
-            return f"ERROR: Project file not found: {project}"
+            return BuildResult(False, f"ERROR: Project file not found: {project}")
+
+        lock_key = (str(proj_path.resolve()), platform, config)
+        request_key = lock_key + (delphi_version, force, max_errors, tuple(dependency_keys or ()))
+        submitted = time.monotonic()
+
+        async def run() -> BuildResult:
+            timer.add("queue", time.monotonic() - submitted)
+            if self.pool is not None:
+                return await self._remote_compile(
+                    proj_path,
+                    config=config,
+                    platform=platform,
+                    delphi_version=delphi_version,
+                    force=force,
+                    max_errors=max_errors,
+                    timeout=timeout,
+                    progress=progress,
+                    timer=timer,
+                    dependency_keys=dependency_keys,
+                )
+            return await self._run_build(
+                proj_path,
+                platform,
+                config,
+                delphi_version=delphi_version,
+                force=force,
+                max_errors=max_errors,
+                progress=progress,
+                timer=timer,
+                dependency_keys=dependency_keys,
+            )
+
+        try:
+            return await self.scheduler.submit(
+                request_key, lock_key, run, timeout=timeout or None
+            )
+        except asyncio.TimeoutError:
+            self.metrics.count("timeout")
+            limit = timeout or self.scheduler.timeout
+            return BuildResult(False, f"ERROR: Build timed out after {limit} s: {proj_path}")
+
+    def _sync_manifest(
+        self, proj_path: Path, platform: str, config: str
+    ) -> tuple[Path, dict[str, str], dict[str, str]]:
+        """Return the sync root, manifest (relative path -> SHA-256) and file map of a build.
+
+        The files are the sources below the project folder plus everything its
+        main source reaches (units on the search path, includes, resources).
+        Relative paths are taken from their common parent, so relative search
+        paths in the project resolve the same way on the worker.
+        """
+        files = set(collect_sources(proj_path.parent))
+        closure = self.project_closure(proj_path, platform, config)
+        if closure:
+            files.update(closure)
+        files.add(str(proj_path.resolve()))
+        abs_files = {os.path.abspath(f) for f in files if os.path.isfile(f)}
+        root = Path(os.path.commonpath([os.path.dirname(f) for f in abs_files]))
+        manifest: dict[str, str] = {}
+        by_rel: dict[str, str] = {}
+        for f in sorted(abs_files):
+            digest = self.build_cache.hasher.digest(f)
+            if digest is None:
+                continue
+            rel = Path(f).relative_to(root).as_posix()
+            manifest[rel] = digest
+            by_rel[rel] = f
+        return root, manifest, by_rel
+
+    async def _remote_compile(
+        self,
+        proj_path: Path,
+        *,
+        config: str,
+        platform: str,
+        delphi_version: str | None,
+        force: bool,
+        max_errors: int,
+        timeout: float,
+        progress: Callable[[BuildOutput], Awaitable[None]] | None,
+        timer: PhaseTimer,
+        dependency_keys: list[str] | None = None,
+    ) -> BuildResult:
+        """Sync a project's sources to a worker, build there and relay the result.
+
+        Called by the scheduler under the project lock, like ``_run_build``.
+        Progress events from the worker are passed to ``progress``; if the
+        worker fails before sending a result, the build is retried on another.
+        """
+        assert self.pool is not None
+        loop = asyncio.get_running_loop()
+        with timer.phase("sync"):
+            sync_root, manifest, files = await loop.run_in_executor(
+                None, self._sync_manifest, proj_path, platform, config
+            )
+        ws_id = workspace_id(sync_root)
+        project_rel = proj_path.resolve().relative_to(sync_root).as_posix()
+        warm_key = f"{ws_id}/{project_rel}/{platform}/{config}"
+        request = {
+            "workspace": ws_id,
+            "manifest": manifest,
+            "project": project_rel,
+            "platform": platform,
+            "config": config,
+            "delphi_version": delphi_version,
+            "force": force,
+            "max_errors": max_errors,
+            "timeout": timeout,
+            "dependency_keys": dependency_keys or [],
+        }
+        tried: set[str] = set()
+        while True:
+            # Waiting for a free, healthy worker counts as queueing
+            with timer.phase("queue"):
+                worker = await self.pool.acquire(warm_key, tried)
+            if worker is None:
+                detail = f" (failed: {', '.join(sorted(tried))})" if tried else ""
+                return BuildResult(False, f"ERROR: No healthy build worker available{detail}")
+            tried.add(worker.url)
+            try:
+                for attempt in range(2):
+                    with timer.phase("sync"):
+                        sent = await self.pool.sync(worker, manifest, files)
+                    stats = BuildOutput()
+                    started = time.monotonic()
+                    try:
+                        async for event in self.pool.build(worker, request):
+                            if event.get("event") == "progress":
+                                stats.lines = event.get("lines", 0)
+                                stats.bytes = event.get("bytes", 0)
+                                stats.errors = event.get("errors", 0)
+                                stats.warnings = event.get("warnings", 0)
+                                stats.current_unit = event.get("unit")
+                                if progress:
+                                    await progress(stats)
+                            elif event.get("event") == "result":
+                                timer.add("compile", time.monotonic() - started)
+                                if event.get("ok"):
+                                    # Do not wait for the next status poll to route here again
+                                    worker.warm.add(warm_key)
+                                result = self._remote_result(worker.url, event, sync_root, len(manifest), sent)
+                                return self._record_remote(result, proj_path, platform, config, stats, timer)
+                    except MissingBlobsError:
+                        # The worker pruned blobs it had before: upload them again
+                        timer.add("compile", time.monotonic() - started)
+                        if attempt:
+                            raise
+                        self.pool.forget_blobs(worker)
+                        continue
+                    raise RemoteBuildError("stream ended without a result")
+            except RemoteBuildError as e:
+                self.pool.mark_failed(worker, e)
+            finally:
+                self.pool.release(worker)
+
+    def _record_remote(
+        self,
+        result: BuildResult,
+        proj_path: Path,
+        platform: str,
+        config: str,
+        stats: BuildOutput,
+        timer: PhaseTimer,
+    ) -> BuildResult:
+        """Account for a remote build in metrics and history; adds this side's timing."""
+        if result.summary.startswith("ERROR"):
+            # Never reached the compiler (bad toolchain, sync failure), as locally
+            return result
+        if result.summary.startswith("Up to date"):
+            self.metrics.build_finished("cached", timer, 0, 0)
+        else:
+            outcome = "ok" if result.ok else "stopped" if result.summary.startswith("Build STOPPED") else "failed"
+            self.metrics.build_finished(outcome, timer, stats.bytes, stats.lines)
+            self.history.record(
+                str(proj_path.resolve()),
+                platform,
+                config,
+                timer.total() - timer.phases.get("queue", 0.0),
+                result.ok,
+            )
+        return BuildResult(
+            result.ok, f"{result.summary}\n{timer.format()}", result.build_id, result.cache_key
+        )
+
+    def _remote_result(
+        self, url: str, event: dict, sync_root: Path, files: int, sent: int
+    ) -> BuildResult:
+        """Turn a worker's result event into a local result and diagnostics."""
+        remote_root = event.get("workspace") or ""
+
+        def local(text: str) -> str:
+            # Report paths as they are on this machine, not in the worker's workspace
+            return text.replace(remote_root, str(sync_root)) if remote_root else text
+
+        build_id = event.get("build_id")
+        if build_id:
+            diagnostics = []
+            for record in event.get("diagnostics", []):
+                if record.get("file"):
+                    record["file"] = local(record["file"])
+                diagnostics.append(Diagnostic(**record))
+            self.diagnostics.add(build_id, diagnostics)
+            self._remote_builds[build_id] = url
+            while len(self._remote_builds) > 1000:
+                self._remote_builds.popitem(last=False)
+        summary = f"{local(event.get('summary', ''))}\nWorker: {url} ({files} files, {sent} bytes synced)"
+        return BuildResult(bool(event.get("ok")), summary, build_id, event.get("cache_key"))
 
-        platform = "Win32"  # default compiler
-        config = "Debug" if debug_build else "Release"
+    async def _run_build(
+        self,
+        proj_path: Path,
+        platform: str,
+        config: str,
+        *,
+        delphi_version: str | None,
+        force: bool,
+        max_errors: int,
+        progress: Callable[[BuildOutput], Awaitable[None]] | None,
+        timer: PhaseTimer,
+        dependency_keys: list[str] | None = None,
+    ) -> BuildResult:
+        """Compile a project; called by the scheduler under the project lock."""
+        started = time.monotonic()
+        toolchain = self.toolchains.resolve(delphi_version)
+        if not toolchain:
+            if delphi_version:
+                return BuildResult(False, f"ERROR: Delphi version not found: {delphi_version}")
+            return BuildResult(False, "ERROR: Delphi installation not found (check DELPHI_PATH)")
 
+        loop = asyncio.get_running_loop()
+        env: dict[str, str] | None = None
+        defines: list[str] = []
         if proj_path.suffix.lower() == ".dproj":
-            rsvars = self.find_rsvars()
-            if not rsvars:
-                return "ERROR: rsvars.bat not found (check DELPHI_PATH)"
-            # Build command without embedded quotes
-            cmd = [
-                "cmd", "/c",
-                "call", rsvars, "&&",
-                "msbuild.exe", str(proj_path), "/t:Build"
-            ]
+            if not toolchain.rsvars:
+                return BuildResult(False, "ERROR: rsvars.bat not found (check DELPHI_PATH)")
+            # rsvars.bat runs only on first use; its environment is reused after that
+            env = await loop.run_in_executor(None, self.toolchains.environment, toolchain)
+            msbuild = await loop.run_in_executor(None, self.toolchains.msbuild_for, toolchain)
+            props = [f"/p:Config={config}", f"/p:Platform={platform}"]
+            if msbuild:
+                cmd = [msbuild, str(proj_path), "/t:Build", *props]
+            else:
+                # Build command without embedded quotes
+                env = None
+                cmd = [
+                    "cmd", "/c",
+                    "call", toolchain.rsvars, "&&",
+                    "msbuild.exe", str(proj_path), "/t:Build", *props
+                ]
         else:
-            # For .dpr, find linked .dpr file
-            dpr_candidates = list(proj_path.parent.glob("*.dpr"))
-            if not dpr_candidates:
-                return f"ERROR: No .dpr file found next to {proj_path.name}"
-            dpr_file = dpr_candidates[0]
+            # A .dpr/.dpk is compiled as given; for anything else use the .dpr next to it
+            if proj_path.suffix.lower() not in (".dpr", ".dpk"):
+                dpr_candidates = sorted(proj_path.parent.glob("*.dpr"))
+                if not dpr_candidates:
+                    return BuildResult(False, f"ERROR: No .dpr file found next to {proj_path.name}")
+                proj_path = dpr_candidates[0]
             # Choose compiler by platform
-            compiler = self.find_delphi_compiler(platform)
+            compiler = toolchain.compiler(platform)
             if not compiler:
-                return f"ERROR: Delphi compiler for {platform} not found"
-            cmd = [compiler, str(dpr_file)]
-            cmd.append("-DRELEASE" if not debug_build else "-DDEBUG")
+                return BuildResult(False, f"ERROR: Delphi compiler for {platform} not found")
+            defines = [config.upper()]
+            cmd = [compiler, str(proj_path)]
+            cmd.extend(f"-D{d}" for d in defines)
+
+        timer.add("toolchain", time.monotonic() - started)
+
+        # Skip the compiler when inputs and outputs are unchanged since the last build
+        with timer.phase("cache_key"):
+            cache_key = await loop.run_in_executor(
+                None, self.build_key, proj_path, defines, platform, config, toolchain, dependency_keys
+            )
+        if not force:
+            cached = self.build_cache.get(cache_key)
+            if cached:
+                self.metrics.build_finished("cached", timer, 0, 0)
+                built_at = datetime.datetime.fromtimestamp(cached.created).strftime("%H:%M:%S")
+                return BuildResult(
+                    cached.exit_code == 0,
+                    f"Up to date (no changes since build at {built_at}).\n{cached.summary}\n"
+                    + timer.format(),
+                    cache_key=cache_key,
+                )
 
-        exit_code, output = await self.run_subprocess(cmd)
-        logging.info("Run %s", " ".join(cmd))
-        logging.info(output)
+        build_id = self._new_build_id()
+        logging.info("Build %s: run %s", build_id, " ".join(cmd))
+        with self.build_logs.open(build_id) as log:
+            log.write("> " + " ".join(cmd))
+            exit_code, output = await self.run_subprocess(
+                cmd, env=env, progress=progress, max_errors=max_errors, log=log, timer=timer
+            )
+            log.write(f"> exit code {exit_code}")
+        self.diagnostics.add(build_id, output.diagnostics)
+        await loop.run_in_executor(None, self.build_logs.enforce_retention)
 
         # Build summary
-        errors = [l for l in output.splitlines() if " error " in l.lower() or l.lower().startswith("error")]
-        warns  = [l for l in output.splitlines() if " warning " in l.lower()]
+        preview = "\n".join(d.format() for d in output.first_errors(5))
+        details = (
+            f"Build id: {build_id} ({output.lines} lines of output; "
+            f"see get_diagnostics and get_build_log)"
+        )
         if exit_code == 0:
-            return f"Build OK. Warnings: {len(warns)}. Full log: {self.log_file}"
+            summary = f"Build OK. Warnings: {output.warnings}. {details}"
+            outputs = [
+                str(p) for p in self.expected_outputs(proj_path, platform, config) if p.exists()
+            ]
+            # Successful builds are only reusable while their binaries exist
+            if outputs:
+                self.build_cache.put(cache_key, summary, exit_code, outputs)
+        elif output.stopped:
+            # Incomplete run: do not cache
+            summary = f"Build STOPPED after {output.errors} errors (max_errors={max_errors}).\n{preview}\n{details}"
         else:
-            preview = "\n".join(errors[:5])
-            return f"Build FAILED (exit {exit_code}). Errors: {len(errors)}.\n{preview}\nFull log: {self.log_file}"
+            # Not cached: a failure may come from outside the hashed inputs
+            # (missing package, locked file), so the next request runs again
+            summary = f"Build FAILED (exit {exit_code}). Errors: {output.errors}. Warnings: {output.warnings}.\n{preview}\n{details}"
+
+        outcome = "ok" if exit_code == 0 else "stopped" if output.stopped else "failed"
+        self.metrics.build_finished(outcome, timer, output.bytes, output.lines)
+        self.history.record(
+            str(proj_path.resolve()),
+            platform,
+            config,
+            timer.total() - timer.phases.get("queue", 0.0),
+            exit_code == 0,
+        )
+        logging.info("Build %s: %s. %s", build_id, outcome, timer.format())
+        return BuildResult(exit_code == 0, f"{summary}\n{timer.format()}", build_id, cache_key)
+
+    async def _build_group(
+        self,
+        group: str | None,
+        platforms: list[str],
+        configs: list[str],
+        *,
+        delphi_version: str | None = None,
+        force: bool = False,
+        timeout: float = 0,
+        ctx: Context | None = None,
+    ) -> str:
+        """Build every project of a group for each platform/config combination."""
+        if not group:
+            candidates = sorted(Path.cwd().glob("*.groupproj"))
+            if not candidates:
+                return "ERROR: No project group (.groupproj) found in current directory"
+            group = str(candidates[0])
+        group_path = Path(group)
+        if not group_path.exists():
+            return f"ERROR: Project group not found: {group}"
+        try:
+            nodes = parse_groupproj(group_path)
+        except ET.ParseError as e:
+            return f"ERROR: Cannot parse {group_path.name}: {e}"
+        if not nodes:
+            return f"ERROR: No projects in {group_path.name}"
+        cycle = find_cycle(nodes)
+        if cycle:
+            return "ERROR: Dependency cycle: " + " -> ".join(p.name for p in cycle)
+
+        matrix = [(p, c) for p in platforms for c in configs]
+        tasks: dict[tuple[Path, str, str], asyncio.Future] = {}
+        total = len(nodes) * len(matrix)
+        done = 0
+
+        async def run_node(node: GroupNode, platform: str, config: str) -> tuple[str, BuildResult]:
+            nonlocal done
+            failed = []
+            dependency_keys = []
+            for dep in sorted(node.dependencies):
+                status, dep_result = await tasks[(dep, platform, config)]
+                if status != "OK":
+                    failed.append(dep.name)
+                dependency_keys.append(dep_result.cache_key)
+            if failed:
+                result = BuildResult(False, f"dependency failed: {', '.join(failed)}")
+                status = "SKIPPED"
+            else:
+                # The dependencies' keys make a dependent stale whenever one of
+                # them changes; without a key its output is unknown, so rebuild
+                result = await self._compile_project(
+                    str(node.path),
+                    config=config,
+                    platform=platform,
+                    delphi_version=delphi_version,
+                    force=force or None in dependency_keys,
+                    timeout=timeout,
+                    dependency_keys=[k for k in dependency_keys if k],
+                )
+                status = "OK" if result.ok else "FAILED"
+            done += 1
+            if ctx is not None:
+                await ctx.report_progress(
+                    done, total, message=f"{node.name} {platform}/{config}: {status}"
+                )
+            return status, result
+
+        started = time.monotonic()
+        # Tasks look up their dependencies' tasks when they first run, i.e. after
+        # this loop has created all of them
+        for platform, config in matrix:
+            for node in nodes:
+                tasks[(node.path, platform, config)] = asyncio.ensure_future(
+                    run_node(node, platform, config)
+                )
+        outcomes = await asyncio.gather(*tasks.values())
+        elapsed = time.monotonic() - started
+
+        counts = {"OK": 0, "FAILED": 0, "SKIPPED": 0}
+        lines = []
+        for (path, platform, config), (status, result) in zip(tasks, outcomes):
+            counts[status] += 1
+            first, _, rest = result.summary.partition("\n")
+            lines.append(f"[{status}] {path.name} {platform}/{config}: {first}")
+            if status == "FAILED" and rest:
+                lines.extend("    " + line for line in rest.splitlines())
+        header = (
+            f"Group {group_path.name}: {len(nodes)} projects x {len(matrix)} platform/config "
+            f"combinations. OK: {counts['OK']}, FAILED: {counts['FAILED']}, "
+            f"SKIPPED: {counts['SKIPPED']}. Wall time: {elapsed:.1f} s"
+        )
+        return header + "\n" + "\n".join(lines)
+
+    def _new_build_id(self) -> str:
+        """Return a unique, time-ordered build id."""
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return f"{stamp}-{uuid.uuid4().hex[:6]}"
 
     def run_stdio(self) -> None:
         """Run server with stdio transport."""
         self.mcp.run(transport="stdio")
         
     def run_http(self, host: str = "localhost", port: int = 8080) -> None:
-        """Run server with HTTP transport."""
-        self.mcp.run(transport="http", host=host, port=port)
+        """Run server with HTTP transport (MCP at /mcp, metrics at /metrics)."""
+        self.mcp.settings.host = host
+        self.mcp.settings.port = port
+        self.mcp.run(transport="streamable-http")
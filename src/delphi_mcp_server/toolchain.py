@@ -0,0 +1,262 @@
+"""RAD Studio toolchain discovery with a cached registry."""
+
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+# Environment variables that influence toolchain resolution.  The registry is
+# rebuilt whenever one of them changes.
+_KEY_VARS = ("DELPHI_PATH", "PATH", "ProgramFiles(x86)", "ProgramFiles")
+
+
+@dataclass(frozen=True)
+class Toolchain:
+    """Resolved tools of a single Delphi installation."""
+
+    root: Path | None
+    version: str | None
+    dcc32: str | None
+    dcc64: str | None
+    msbuild: str | None
+    rsvars: str | None
+
+    def compiler(self, platform: str) -> str | None:
+        """Return the command-line compiler for the given platform."""
+        platform = platform.lower()
+        if platform == "win32":
+            return self.dcc32
+        if platform == "win64":
+            return self.dcc64
+        return None
+
+    @property
+    def identity(self) -> str:
+        """Stable identifier of this toolchain (used for build cache keys)."""
+        return "|".join(str(p) for p in (self.version, self.dcc32, self.dcc64, self.msbuild))
+
+
+def _bin_candidates(root: Path) -> list[Path]:
+    """Return directories that may hold the compilers for an installation root."""
+    return [root] if root.name.lower() == "bin" else [root, root / "bin"]
+
+
+def _find_in(dirs: list[Path], exe: str) -> str | None:
+    for base in dirs:
+        cand = base / exe
+        if cand.is_file():
+            return str(cand)
+    return None
+
+
+def _path_dirs(path_value: str) -> list[Path]:
+    return [Path(p) for p in path_value.split(os.pathsep) if p]
+
+
+def capture_rsvars_environment(rsvars: str) -> dict[str, str]:
+    """Run rsvars.bat once and return the environment it produces.
+
+    On non-Windows hosts (or when the batch file fails) the current process
+    environment is returned unchanged.
+    """
+    env = dict(os.environ)
+    if os.name != "nt":
+        return env
+    try:
+        result = subprocess.run(
+            ["cmd", "/c", "call", rsvars, ">nul", "&&", "set"],
+            capture_output=True,
+            text=True,
+            errors="ignore",
+            check=False,
+        )
+    except OSError as e:
+        logging.warning("Failed to run %s: %s", rsvars, e)
+        return env
+    if result.returncode != 0:
+        logging.warning("%s exited with code %s", rsvars, result.returncode)
+        return env
+    captured: dict[str, str] = {}
+    for line in result.stdout.splitlines():
+        name, sep, value = line.partition("=")
+        if sep and name:
+            captured[name] = value
+    return captured or env
+
+
+class ToolchainRegistry:
+    """Resolve dcc32/dcc64/msbuild/rsvars once per environment.
+
+    Results are keyed on ``DELPHI_PATH``/``PATH`` (and the Program Files
+    locations used to enumerate installed versions), so filesystem probing
+    only happens again when those variables change.  The environment produced
+    by ``rsvars.bat`` is captured once per toolchain and reused to launch
+    msbuild directly.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key: tuple[str, ...] | None = None
+        self._toolchains: dict[str | None, Toolchain | None] = {}
+        self._installed: dict[str, Path] | None = None
+        self._environments: dict[Toolchain, dict[str, str]] = {}
+        self._msbuild: dict[Toolchain, str | None] = {}
+
+    def _current_key(self) -> tuple[str, ...]:
+        return tuple(os.environ.get(name, "") for name in _KEY_VARS)
+
+    def _check_key(self) -> None:
+        """Drop cached results if the relevant environment changed."""
+        key = self._current_key()
+        if key != self._key:
+            self._key = key
+            self._toolchains.clear()
+            self._installed = None
+            self._environments.clear()
+            self._msbuild.clear()
+
+    def invalidate(self) -> None:
+        """Forget all resolved toolchains."""
+        with self._lock:
+            self._key = None
+            self._check_key()
+
+    def installed_versions(self) -> dict[str, Path]:
+        """Return installed RAD Studio versions mapped to their root folder."""
+        with self._lock:
+            self._check_key()
+            return dict(self._scan_installed())
+
+    def _scan_installed(self) -> dict[str, Path]:
+        if self._installed is not None:
+            return self._installed
+        found: dict[str, Path] = {}
+        for var in ("ProgramFiles(x86)", "ProgramFiles"):
+            base = os.environ.get(var)
+            if not base:
+                continue
+            studio = Path(base) / "Embarcadero" / "Studio"
+            try:
+                entries = sorted(studio.iterdir())
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name not in found and (entry / "bin").is_dir():
+                    found[entry.name] = entry
+        self._installed = found
+        return found
+
+    def _from_root(self, root: Path, version: str | None) -> Toolchain | None:
+        dirs = _bin_candidates(root)
+        dcc32 = _find_in(dirs, "dcc32.exe")
+        dcc64 = _find_in(dirs, "dcc64.exe")
+        rsvars = _find_in(dirs, "rsvars.bat")
+        if not (dcc32 or dcc64 or rsvars):
+            return None
+        msbuild = _find_in(dirs, "msbuild.exe")
+        if version is None:
+            version = (root.parent if root.name.lower() == "bin" else root).name or None
+        return Toolchain(root, version, dcc32, dcc64, msbuild, rsvars)
+
+    def _from_path(self) -> Toolchain | None:
+        dirs = _path_dirs(os.environ.get("PATH", ""))
+        dcc32 = _find_in(dirs, "dcc32.exe")
+        dcc64 = _find_in(dirs, "dcc64.exe")
+        if not (dcc32 or dcc64):
+            return None
+        comp_dir = [Path(dcc32 or dcc64).parent]  # type: ignore[arg-type]
+        rsvars = _find_in(comp_dir, "rsvars.bat")
+        msbuild = _find_in(comp_dir, "msbuild.exe") or _find_in(dirs, "msbuild.exe")
+        return Toolchain(None, None, dcc32, dcc64, msbuild, rsvars)
+
+    def _resolve_default(self) -> Toolchain | None:
+        root = os.environ.get("DELPHI_PATH")
+        tc = self._from_root(Path(root), None) if root else None
+        path_tc = self._from_path()
+        if tc and path_tc:
+            # Compilers missing under DELPHI_PATH are still looked up in PATH
+            return Toolchain(
+                tc.root,
+                tc.version,
+                tc.dcc32 or path_tc.dcc32,
+                tc.dcc64 or path_tc.dcc64,
+                tc.msbuild or path_tc.msbuild,
+                tc.rsvars or path_tc.rsvars,
+            )
+        if tc or path_tc:
+            return tc or path_tc
+        installed = self._scan_installed()
+        if installed:
+            latest = max(installed, key=_version_sort_key)
+            return self._from_root(installed[latest], latest)
+        return None
+
+    def _resolve_version(self, version: str) -> Toolchain | None:
+        path = Path(version)
+        if path.is_dir():
+            return self._from_root(path, None)
+        installed = self._scan_installed()
+        if version in installed:
+            return self._from_root(installed[version], version)
+        # Allow "23" to select "23.0"
+        matches = [v for v in installed if v.split(".")[0] == version]
+        if matches:
+            latest = max(matches, key=_version_sort_key)
+            return self._from_root(installed[latest], latest)
+        return None
+
+    def resolve(self, version: str | None = None) -> Toolchain | None:
+        """Return the toolchain for a Delphi version.
+
+        Args:
+            version: Installed version folder name (e.g. ``"23.0"`` or ``"23"``)
+                or a path to an installation. ``None`` selects ``DELPHI_PATH``,
+                then ``PATH``, then the newest installed version.
+        """
+        with self._lock:
+            self._check_key()
+            if version not in self._toolchains:
+                tc = self._resolve_version(version) if version else self._resolve_default()
+                self._toolchains[version] = tc
+            return self._toolchains[version]
+
+    def environment(self, toolchain: Toolchain) -> dict[str, str]:
+        """Return the build environment for a toolchain, running rsvars.bat once."""
+        with self._lock:
+            self._check_key()
+            env = self._environments.get(toolchain)
+            if env is not None:
+                return env
+        env = capture_rsvars_environment(toolchain.rsvars) if toolchain.rsvars else dict(os.environ)
+        with self._lock:
+            return self._environments.setdefault(toolchain, env)
+
+    def msbuild_for(self, toolchain: Toolchain) -> str | None:
+        """Locate msbuild.exe using the toolchain's captured environment."""
+        if toolchain.msbuild:
+            return toolchain.msbuild
+        with self._lock:
+            self._check_key()
+            if toolchain in self._msbuild:
+                return self._msbuild[toolchain]
+        env = self.environment(toolchain)
+        dirs = []
+        framework = env.get("FrameworkDir")
+        if framework:
+            dirs.append(Path(framework))
+        dirs.extend(_path_dirs(env.get("PATH", env.get("Path", ""))))
+        msbuild = _find_in(dirs, "msbuild.exe")
+        with self._lock:
+            self._msbuild[toolchain] = msbuild
+        return msbuild
+
+
+def _version_sort_key(version: str) -> tuple[int, ...]:
+    parts = []
+    for piece in version.split("."):
+        parts.append(int(piece) if piece.isdigit() else -1)
+    return tuple(parts)
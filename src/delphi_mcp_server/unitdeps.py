@@ -0,0 +1,498 @@
+"""Pascal unit scanning and a persistent unit dependency graph."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+# Conditional symbols the compiler defines for each target platform
+PLATFORM_DEFINES = {
+    "win32": ("MSWINDOWS", "WIN32", "CPUX86", "CPU32BITS", "CPU386"),
+    "win64": ("MSWINDOWS", "WIN64", "CPUX64", "CPU64BITS"),
+    "linux64": ("LINUX", "LINUX64", "POSIX", "CPUX64", "CPU64BITS"),
+    "osx64": ("MACOS", "MACOS64", "POSIX", "CPUX64", "CPU64BITS"),
+}
+COMPILER_DEFINES = ("CONDITIONALEXPRESSIONS", "UNICODE", "NATIVECODE")
+
+_TOKEN_RE = re.compile(
+    r"""
+    \{\$(?P<dir1>[^}]*)\}
+    |\(\*\$(?P<dir2>.*?)\*\)
+    |\{[^}]*\}
+    |\(\*.*?\*\)
+    |//[^\n]*
+    |'(?P<str>(?:[^']|'')*)'
+    |(?P<id>&?[A-Za-z_]\w*)
+    |(?P<sym>[.,;])
+    |\s+
+    |.
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+_DIRECTIVE_RE = re.compile(r"\s*([A-Za-z]+)\s*(.*)", re.DOTALL)
+_IF_TOKEN_RE = re.compile(r"\w+|\(|\)|\S")
+
+MAX_INCLUDE_DEPTH = 16
+
+
+def platform_defines(platform: str) -> tuple[str, ...]:
+    return PLATFORM_DEFINES.get(platform.lower(), ()) + COMPILER_DEFINES
+
+
+@dataclass
+class UnitInfo:
+    """Dependencies declared by one source file (after conditional compilation)."""
+
+    kind: str = "unit"
+    name: str | None = None
+    interface_uses: list[list] = field(default_factory=list)  # [name, in-path or None]
+    implementation_uses: list[list] = field(default_factory=list)
+    requires: list[str] = field(default_factory=list)
+    includes: list[str] = field(default_factory=list)
+    resources: list[str] = field(default_factory=list)
+
+    def uses(self) -> list[list]:
+        return self.interface_uses + self.implementation_uses
+
+
+def _eval_if(expr: str, defines: set[str]) -> bool:
+    """Evaluate a {$IF} expression.
+
+    ``Defined(X)``, ``not``, ``and``, ``or`` and parentheses are supported;
+    anything else (CompilerVersion checks, Declared(), ...) counts as true so
+    that dependencies are over- rather than under-approximated.
+    """
+    tokens = [t.upper() for t in _IF_TOKEN_RE.findall(expr)]
+    pos = 0
+
+    def peek() -> str | None:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def or_expr() -> bool:
+        nonlocal pos
+        value = and_expr()
+        while peek() == "OR":
+            pos += 1
+            value = and_expr() or value
+        return value
+
+    def and_expr() -> bool:
+        nonlocal pos
+        value = not_expr()
+        while peek() == "AND":
+            pos += 1
+            value = not_expr() and value
+        return value
+
+    def not_expr() -> bool:
+        nonlocal pos
+        if peek() == "NOT":
+            pos += 1
+            return not not_expr()
+        return primary()
+
+    def primary() -> bool:
+        nonlocal pos
+        tok = peek()
+        if tok == "(":
+            pos += 1
+            value = or_expr()
+            if peek() == ")":
+                pos += 1
+            return value
+        if tok == "DEFINED" and tokens[pos + 1 : pos + 2] == ["("]:
+            name = tokens[pos + 2] if pos + 2 < len(tokens) else ""
+            pos += 4
+            return name in defines
+        # Unknown term: skip to the next operator at this nesting level
+        depth = 0
+        while peek() is not None:
+            tok = peek()
+            if depth == 0 and tok in ("AND", "OR", ")"):
+                break
+            if tok == "(":
+                depth += 1
+            elif tok == ")":
+                depth -= 1
+            pos += 1
+        return True
+
+    try:
+        return or_expr()
+    except IndexError:
+        return True
+
+
+class _Scanner:
+    """Token stream of a file with conditional compilation and includes applied."""
+
+    def __init__(
+        self,
+        defines: set[str],
+        resolve_include: Callable[[str, Path], Path | None],
+        info: UnitInfo,
+    ):
+        self.defines = defines
+        self.resolve_include = resolve_include
+        self.info = info
+        # Each frame: [parent_active, active, branch_taken]
+        self.stack: list[list[bool]] = []
+
+    @property
+    def active(self) -> bool:
+        return not self.stack or self.stack[-1][1]
+
+    def _directive(self, body: str, path: Path, depth: int) -> Iterator[tuple[str, str]]:
+        m = _DIRECTIVE_RE.match(body)
+        if not m:
+            return
+        name, arg = m.group(1).upper(), m.group(2).strip()
+        word = arg.split()[0].upper() if arg.split() else ""
+        if name in ("IFDEF", "IFNDEF", "IF", "IFOPT"):
+            parent = self.active
+            if name == "IFDEF":
+                cond = word in self.defines
+            elif name == "IFNDEF":
+                cond = word not in self.defines
+            elif name == "IF":
+                cond = _eval_if(arg, self.defines)
+            else:
+                cond = True
+            self.stack.append([parent, parent and cond, cond])
+        elif name in ("ELSE", "ELSEIF") and self.stack:
+            frame = self.stack[-1]
+            cond = not frame[2] and (name == "ELSE" or _eval_if(arg, self.defines))
+            frame[1] = frame[0] and cond
+            frame[2] = frame[2] or cond
+        elif name in ("ENDIF", "IFEND") and self.stack:
+            self.stack.pop()
+        elif not self.active:
+            return
+        elif name == "DEFINE" and word:
+            self.defines.add(word)
+        elif name == "UNDEF" and word:
+            self.defines.discard(word)
+        elif name in ("I", "INCLUDE") and arg and arg[0] not in "+-":
+            target = self.resolve_include(arg.strip("'\""), path.parent)
+            if target is not None and depth < MAX_INCLUDE_DEPTH:
+                self.info.includes.append(str(target))
+                try:
+                    text = target.read_text(encoding="utf-8-sig", errors="ignore")
+                except OSError:
+                    return
+                yield from self.tokens(text, target, depth + 1)
+        elif name in ("R", "RESOURCE") and arg and arg[0] not in "+-":
+            res = arg.split()[0].strip("'\"").replace("*", path.stem)
+            self.info.resources.append(str(path.parent / res.replace("\\", "/")))
+
+    def tokens(self, text: str, path: Path, depth: int = 0) -> Iterator[tuple[str, str]]:
+        for m in _TOKEN_RE.finditer(text):
+            kind = m.lastgroup
+            if kind is None:
+                continue
+            if kind in ("dir1", "dir2"):
+                yield from self._directive(m.group(kind), path, depth)
+            elif self.active:
+                yield kind, m.group(kind)
+
+
+def scan_source(
+    path: Path,
+    defines: set[str],
+    resolve_include: Callable[[str, Path], Path | None],
+) -> UnitInfo:
+    """Extract the uses/requires clauses, includes and resources of a file.
+
+    Comments and strings are skipped and ``{$IFDEF}`` regions are evaluated
+    against ``defines`` (which ``{$DEFINE}`` directives may extend).
+
+    Raises:
+        OSError: The file cannot be read.
+    """
+    text = path.read_text(encoding="utf-8-sig", errors="ignore")
+    info = UnitInfo()
+    scanner = _Scanner({d.upper() for d in defines}, resolve_include, info)
+    requires: list[list] = []
+    section = info.interface_uses
+    target = section
+    mode: str | None = None  # "name" (unit header) or "clause" (uses/contains/requires)
+    first = True
+    parts: list[str] = []
+    in_path: str | None = None
+    expect_in = False
+
+    for kind, value in scanner.tokens(text, path):
+        if mode == "name":
+            if kind == "id":
+                parts.append(value.lstrip("&"))
+            elif value != ".":
+                info.name = ".".join(parts) or None
+                parts = []
+                mode = None
+            continue
+        if mode == "clause":
+            if kind == "id":
+                word = value.lstrip("&")
+                if word.lower() == "in" and parts:
+                    expect_in = True
+                else:
+                    parts.append(word)
+            elif kind == "str" and expect_in:
+                in_path = value.replace("''", "'")
+                expect_in = False
+            elif value in (",", ";"):
+                if parts:
+                    target.append([".".join(parts), in_path])
+                parts, in_path, expect_in = [], None, False
+                if value == ";":
+                    mode = None
+            continue
+        if kind != "id":
+            continue
+        word = value.lower()
+        if first and word in ("unit", "program", "library", "package"):
+            info.kind = word
+            mode = "name"
+            first = False
+            continue
+        first = False
+        if word == "interface":
+            section = target = info.interface_uses
+        elif word == "implementation":
+            section = target = info.implementation_uses
+        elif word == "uses" or (info.kind == "package" and word == "contains"):
+            target = section
+            mode = "clause"
+        elif info.kind == "package" and word == "requires":
+            target = requires
+            mode = "clause"
+    info.requires = [name for name, _ in requires]
+    return info
+
+
+def default_store_path() -> Path:
+    """Location of the persisted dependency graph in the user's cache folder."""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    root = Path(base) if base else Path.home() / ".cache"
+    return root / "delphi-compiler-mcp" / "unit_graph.json"
+
+
+def _stamp(path: str) -> list[int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _norm(path: str | Path) -> str:
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+
+class DependencyGraph:
+    """Unit dependency graph, updated incrementally and persisted to disk.
+
+    Scan results are cached per file, define set and include path, and reused
+    while the file and the include files it pulled in keep their mtime and
+    size.  Reachability (``closure``) is recomputed from the cached scans, so
+    an edit only costs a rescan of the edited files.
+
+    The cache is bounded: each file keeps its ``max_keys_per_file`` most
+    recently used scans, at most ``max_files`` files are kept (least recently
+    used go first), and files that no longer exist are dropped on load and
+    when a rescan finds them gone.
+    """
+
+    STORE_VERSION = 1
+
+    def __init__(
+        self,
+        store: Path | None = None,
+        save_interval: float = 30.0,
+        max_keys_per_file: int = 8,
+        max_files: int = 200_000,
+    ):
+        self.store = store
+        self.save_interval = save_interval
+        self.max_keys_per_file = max_keys_per_file
+        self.max_files = max_files
+        # path -> scan key -> (stamps of file and includes, scan result), both LRU ordered
+        self._scans: OrderedDict[
+            str, OrderedDict[str, tuple[dict[str, list[int] | None], UnitInfo]]
+        ] = OrderedDict()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.store:
+            return
+        try:
+            data = json.loads(self.store.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.STORE_VERSION:
+            return
+        # The store keeps LRU order, oldest first
+        for path, scans in data.get("files", {}).items():
+            if not os.path.exists(path):
+                self._dirty = True
+                continue
+            self._scans[path] = OrderedDict(
+                (key, (rec["stamps"], UnitInfo(**rec["info"])))
+                for key, rec in list(scans.items())[-self.max_keys_per_file:]
+            )
+        while len(self._scans) > self.max_files:
+            self._scans.popitem(last=False)
+            self._dirty = True
+
+    def save(self, force: bool = True) -> None:
+        """Write the graph to its store (only if something changed)."""
+        with self._lock:
+            if not self.store or not self._dirty:
+                return
+            if not force and time.monotonic() - self._last_save < self.save_interval:
+                return
+            data = {
+                "version": self.STORE_VERSION,
+                "files": {
+                    path: {
+                        key: {"stamps": stamps, "info": asdict(info)}
+                        for key, (stamps, info) in scans.items()
+                    }
+                    for path, scans in self._scans.items()
+                },
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp: Path | None = None
+        try:
+            self.store.parent.mkdir(parents=True, exist_ok=True)
+            # Unique name: other servers (or threads) may save the same store at once
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self.store.parent,
+                prefix=self.store.name + ".", suffix=".tmp", delete=False,
+            ) as f:
+                tmp = Path(f.name)
+                json.dump(data, f)
+            os.replace(tmp, self.store)
+        except OSError as e:
+            logging.warning("Cannot save dependency graph to %s: %s", self.store, e)
+            if tmp is not None:
+                tmp.unlink(missing_ok=True)
+
+    def scan(self, path: str, defines: frozenset[str], include_dirs: tuple[str, ...]) -> UnitInfo | None:
+        """Return the (cached) scan of a file, or None if it cannot be read."""
+        key = ";".join(sorted(defines)) + "|" + ";".join(include_dirs)
+        with self._lock:
+            scans = self._scans.get(path)
+            cached = scans.get(key) if scans else None
+            if cached:
+                self._scans.move_to_end(path)
+                scans.move_to_end(key)
+        if cached and all(_stamp(p) == s for p, s in cached[0].items()):
+            return cached[1]
+
+        def resolve_include(name: str, base: Path) -> Path | None:
+            name = name.replace("\\", "/")
+            for d in (base, *map(Path, include_dirs)):
+                cand = d / name
+                if cand.is_file():
+                    return cand
+            return None
+
+        try:
+            info = scan_source(Path(path), set(defines), resolve_include)
+        except OSError:
+            if not os.path.exists(path):
+                with self._lock:
+                    if self._scans.pop(path, None) is not None:
+                        self._dirty = True
+            return None
+        stamps = {p: _stamp(p) for p in [path, *info.includes]}
+        with self._lock:
+            scans = self._scans.setdefault(path, OrderedDict())
+            scans[key] = (stamps, info)
+            scans.move_to_end(key)
+            while len(scans) > self.max_keys_per_file:
+                scans.popitem(last=False)
+            self._scans.move_to_end(path)
+            while len(self._scans) > self.max_files:
+                self._scans.popitem(last=False)
+            self._dirty = True
+        return info
+
+    def closure(
+        self,
+        main: Path,
+        defines: set[str],
+        search_dirs: list[Path],
+        unit_index: dict[str, list[str]],
+    ) -> set[str]:
+        """Return every file a project's main source reaches.
+
+        Args:
+            main: The .dpr/.dpk file.
+            defines: Conditional symbols active for the build.
+            search_dirs: Unit search path of the project.
+            unit_index: Unit name (lower case) -> candidate .pas files.
+
+        Returns:
+            Normalised paths of units, include files and resources.
+        """
+        frozen = frozenset(d.upper() for d in defines)
+        include_dirs = tuple(str(d) for d in search_dirs)
+        seen: set[str] = set()
+        queue = [os.path.normpath(str(main))]
+        while queue:
+            path = queue.pop()
+            norm = _norm(path)
+            if norm in seen:
+                continue
+            seen.add(norm)
+            info = self.scan(path, frozen, include_dirs)
+            if info is None:
+                continue
+            seen.update(_norm(p) for p in info.includes)
+            seen.update(_norm(p) for p in info.resources)
+            base = Path(path).parent
+            for name, in_path in info.uses():
+                queue.extend(self._resolve_unit(name, in_path, base, search_dirs, unit_index))
+        self.save(force=False)
+        return seen
+
+    @staticmethod
+    def _resolve_unit(
+        name: str,
+        in_path: str | None,
+        base: Path,
+        search_dirs: list[Path],
+        unit_index: dict[str, list[str]],
+    ) -> list[str]:
+        if in_path:
+            cand = base / in_path.replace("\\", "/")
+            return [os.path.normpath(str(cand))] if cand.is_file() else []
+        candidates = unit_index.get(name.lower())
+        if candidates:
+            dirs = {_norm(d) for d in (base, *search_dirs)}
+            for cand in candidates:
+                if _norm(os.path.dirname(cand)) in dirs:
+                    return [cand]
+            # Ambiguous or unrelated location: keep all, over-approximating
+            return list(candidates)
+        # Units outside the indexed tree (e.g. a shared library on the search path)
+        for d in search_dirs:
+            cand = d / f"{name}.pas"
+            if cand.is_file():
+                return [os.path.normpath(str(cand))]
+        return []
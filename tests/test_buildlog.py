@@ -0,0 +1,47 @@
+"""Tests for ranged reads of plain and compressed build logs."""
+
+import re
+
+import pytest
+
+from delphi_mcp_server import buildlog
+from delphi_mcp_server.buildlog import BuildLogStore
+
+LINES = [f"Unit{i}.pas({i * 7}) " + "x" * (i % 50) for i in range(2000)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Small members so a log spans many of them
+    monkeypatch.setattr(buildlog, "_MEMBER", 4096)
+    store = BuildLogStore(tmp_path, keep_plain=1)
+    for build_id in ("20240101-000000-aaaaaa", "20240101-000001-bbbbbb"):
+        with store.open(build_id) as log:
+            for line in LINES:
+                log.write(line)
+    store.enforce_retention()
+    return store
+
+
+def test_older_log_is_compressed_with_index(store, tmp_path):
+    assert store.path("20240101-000000-aaaaaa").suffix == ".gz"
+    assert (tmp_path / "20240101-000000-aaaaaa.log.idx").is_file()
+    assert store.path("20240101-000001-bbbbbb").suffix == ".log"
+
+
+@pytest.mark.parametrize("build_id", ["20240101-000000-aaaaaa", "20240101-000001-bbbbbb"])
+def test_reads_match_plain_text(store, build_id):
+    text = ("\n".join(LINES) + "\n").encode()
+    assert store.size(build_id) == len(text)
+    for offset, length in [(0, 100), (4090, 20), (4096, 8192), (len(text) - 5, 100), (len(text) + 10, 5)]:
+        assert store.read(build_id, offset, length) == text[offset:offset + length]
+    assert store.tail(build_id, 3) == LINES[-3:]
+    assert store.tail(build_id, 500) == LINES[-500:]
+    matches, total = store.grep(build_id, re.compile(r"Unit19\d\d\.pas"), 5)
+    assert total == 100 and matches[0] == (1901, LINES[1900])
+
+
+def test_retention_deletes_index(store, tmp_path):
+    store.max_builds = 1
+    store.enforce_retention()
+    assert not list(tmp_path.glob("20240101-000000-aaaaaa.*"))
@@ -0,0 +1,107 @@
+"""Tests for parsing dcc/msbuild diagnostic lines."""
+
+import pytest
+
+from delphi_mcp_server.diagnostics import parse_line
+
+X86 = r"C:\Program Files (x86)\Embarcadero\Studio\23.0\Bin\CodeGear.Delphi.Targets"
+PROJ = r"C:\Users\me\Projects (2024)\App"
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        # dcc
+        (
+            "Unit1.pas(12) Error: E2003 Undeclared identifier: 'Foo'",
+            ("error", "E2003", "Undeclared identifier: 'Foo'", "Unit1.pas", 12, None),
+        ),
+        (
+            "Unit1.pas(7) Warning: W1000 Symbol 'X' is deprecated",
+            ("warning", "W1000", "Symbol 'X' is deprecated", "Unit1.pas", 7, None),
+        ),
+        (
+            "Unit1.pas(30) Hint: H2164 Variable 'Tmp' is declared but never used",
+            ("hint", "H2164", "Variable 'Tmp' is declared but never used", "Unit1.pas", 30, None),
+        ),
+        (
+            "P.dpr(5) Fatal: F2063 Could not compile used unit 'Unit1.pas'",
+            ("error", "F2063", "Could not compile used unit 'Unit1.pas'", "P.dpr", 5, None),
+        ),
+        (
+            PROJ + r"\Unit1.pas(12) Error: E2003 Undeclared identifier: 'Foo'",
+            ("error", "E2003", "Undeclared identifier: 'Foo'", PROJ + r"\Unit1.pas", 12, None),
+        ),
+        # dcc without a location
+        (
+            "Fatal: F1026 File not found: 'Foo.dpr'",
+            ("error", "F1026", "File not found: 'Foo.dpr'", None, None, None),
+        ),
+        (
+            "Error: E2202 Required package 'rtl' not found",
+            ("error", "E2202", "Required package 'rtl' not found", None, None, None),
+        ),
+        (
+            "Hint: H2443 Inline function 'Foo' has not been expanded",
+            ("hint", "H2443", "Inline function 'Foo' has not been expanded", None, None, None),
+        ),
+        # IDE form
+        (
+            "[dcc32 Error] Unit1.pas(12): E2003 Undeclared identifier: 'Foo'",
+            ("error", "E2003", "Undeclared identifier: 'Foo'", "Unit1.pas", 12, None),
+        ),
+        (
+            "[dcc64 Warning] " + PROJ + r"\Unit1.pas(3,9): W1036 Variable 'I' might not have been initialized",
+            ("warning", "W1036", "Variable 'I' might not have been initialized", PROJ + r"\Unit1.pas", 3, 9),
+        ),
+        (
+            "[dcc32 Fatal Error] F1026 File not found: 'Foo.dcu'",
+            ("error", "F1026", "File not found: 'Foo.dcu'", None, None, None),
+        ),
+        # msbuild
+        (
+            r"  C:\src\Unit1.pas(12,5): error E2003: Undeclared identifier: 'Foo' [C:\src\P.dproj]",
+            ("error", "E2003", "Undeclared identifier: 'Foo'", r"C:\src\Unit1.pas", 12, 5),
+        ),
+        (
+            X86 + r"(386,5): error E2202: Required package 'rtl' not found [C:\src\P.dproj]",
+            ("error", "E2202", "Required package 'rtl' not found", X86, 386, 5),
+        ),
+        (
+            PROJ + r"\Unit1.pas(12,5): warning W1000: Symbol 'A(1)' is deprecated [" + PROJ + r"\P.dproj]",
+            ("warning", "W1000", "Symbol 'A(1)' is deprecated", PROJ + r"\Unit1.pas", 12, 5),
+        ),
+        (
+            r"C:\src\P.dproj : error MSB4025: The project file could not be loaded.",
+            ("error", "MSB4025", "The project file could not be loaded.", r"C:\src\P.dproj", None, None),
+        ),
+        (
+            r'EXEC : error : The command "x.exe" exited with code 1. [C:\src\P.dproj]',
+            ("error", None, 'The command "x.exe" exited with code 1.', "EXEC", None, None),
+        ),
+        (
+            "MSBUILD : error MSB1009: Project file does not exist.",
+            ("error", "MSB1009", "Project file does not exist.", "MSBUILD", None, None),
+        ),
+    ],
+)
+def test_parse_line(line, expected):
+    d = parse_line(line)
+    assert d is not None
+    assert (d.severity, d.code, d.message, d.file, d.line, d.column) == expected
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "Unit3.pas(111)",
+        "    9 Warning(s)",
+        "    0 Error(s)",
+        "Build FAILED.",
+        "Embarcadero Delphi for Win32 compiler version 36.0",
+        "12345 lines, 0.42 seconds, 1234567 bytes code, 123456 bytes data.",
+    ],
+)
+def test_parse_line_ignores_other_output(line):
+    assert parse_line(line) is None
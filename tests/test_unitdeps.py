@@ -0,0 +1,48 @@
+"""Tests for the bounds of the persisted unit scan cache."""
+
+from delphi_mcp_server.unitdeps import DependencyGraph
+
+
+def _unit(path, name):
+    path.write_text(f"unit {name};\ninterface\nuses System.SysUtils;\nimplementation\nend.\n")
+    return str(path)
+
+
+def test_scan_keys_per_file_are_capped(tmp_path):
+    graph = DependencyGraph(max_keys_per_file=2)
+    path = _unit(tmp_path / "A.pas", "A")
+    for define in ("D1", "D2", "D3"):
+        graph.scan(path, frozenset({define}), ())
+    assert list(graph._scans[path]) == ["D2|", "D3|"]
+    # A hit makes a key most recently used
+    graph.scan(path, frozenset({"D2"}), ())
+    graph.scan(path, frozenset({"D4"}), ())
+    assert list(graph._scans[path]) == ["D2|", "D4|"]
+
+
+def test_least_recently_used_files_are_dropped(tmp_path):
+    graph = DependencyGraph(max_files=2)
+    paths = [_unit(tmp_path / f"U{i}.pas", f"U{i}") for i in range(3)]
+    for path in paths:
+        graph.scan(path, frozenset(), ())
+    assert list(graph._scans) == paths[1:]
+
+
+def test_deleted_files_are_dropped(tmp_path):
+    store = tmp_path / "graph.json"
+    graph = DependencyGraph(store)
+    kept = _unit(tmp_path / "Kept.pas", "Kept")
+    gone = tmp_path / "Gone.pas"
+    moved = tmp_path / "Moved.pas"
+    graph.scan(kept, frozenset(), ())
+    graph.scan(_unit(gone, "Gone"), frozenset(), ())
+    graph.scan(_unit(moved, "Moved"), frozenset(), ())
+    graph.save()
+    # Deleted while the server runs: dropped when the rescan fails
+    moved.unlink()
+    assert graph.scan(str(moved), frozenset(), ()) is None
+    assert str(moved) not in graph._scans
+    graph.save()
+    # Deleted between runs: dropped on load
+    gone.unlink()
+    assert list(DependencyGraph(store)._scans) == [kept]